@@ -0,0 +1,86 @@
+# bench_import.py
+# Measures structure import throughput against fake_discord's emulated rate
+# limits. Nothing here talks to Discord.
+#
+#   python bench_import.py                      # 10/100/1000 objects, both modes
+#   python bench_import.py --sizes 100 --scale 0.1
+#
+# "importjson" paces like the !importjson command (fixed sleep per object and
+# one progress message per object); "rollout" paces with the shared
+# RateBudget and reports silently. Times are shown in emulated seconds, i.e.
+# wall time divided by --scale.
+import argparse
+import asyncio
+import time
+from typing import Any, Dict
+
+import structure
+from fake_discord import FakeGuild, FakeHTTP
+
+
+def make_template(size: int) -> Dict[str, Any]:
+    """A valid template with about ``size`` objects: 1/5 roles, 1/10 categories, the rest channels."""
+    role_count = max(1, size // 5)
+    category_count = max(1, size // 10)
+    channel_count = max(1, size - role_count - category_count)
+    roles = [
+        {"name": f"role-{i}", "color": f"#{(i * 2654435761) & 0xFFFFFF:06x}", "permissions": ["send_messages"]}
+        for i in range(role_count)
+    ]
+    categories = [{"name": f"category-{i}", "channels": []} for i in range(category_count)]
+    for i in range(channel_count):
+        categories[i % category_count]["channels"].append(
+            {"name": f"channel-{i}", "type": "voice" if i % 4 == 3 else "text"}
+        )
+    return structure.compile_structure({"roles": roles, "categories": categories})
+
+
+async def run_once(size: int, mode: str, scale: float, seed: int) -> Dict[str, Any]:
+    http = FakeHTTP(time_scale=scale, seed=seed)
+    guild = FakeGuild(http)
+    data = make_template(size)
+
+    if mode == "importjson":
+        report = guild.report_channel.send
+        budget = None
+    else:
+        async def report(line: str):
+            pass
+        budget = structure.RateBudget(structure.ROLLOUT_RATE / scale, burst=structure.ROLLOUT_MAX_GUILDS)
+
+    delay = structure.ITEM_DELAY_SECONDS
+    structure.ITEM_DELAY_SECONDS = delay * scale
+    try:
+        started = time.perf_counter()
+        complete = await structure.apply_structure(guild, data, report, budget=budget)
+        elapsed = time.perf_counter() - started
+    finally:
+        structure.ITEM_DELAY_SECONDS = delay
+
+    return {
+        "size": size,
+        "mode": mode,
+        "complete": complete,
+        "seconds": elapsed / scale,
+        "calls": http.calls,
+        "429s": http.rate_limited,
+    }
+
+
+async def main(sizes, modes, scale: float, seed: int):
+    print(f"{'objects':>8} {'mode':<11} {'emulated s':>11} {'API calls':>10} {'429s':>6}")
+    for size in sizes:
+        for mode in modes:
+            r = await run_once(size, mode, scale, seed)
+            flag = "" if r["complete"] else "  (incomplete)"
+            print(f"{r['size']:>8} {r['mode']:<11} {r['seconds']:>11.1f} {r['calls']:>10} {r['429s']:>6}{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the structure import path against emulated Discord rate limits.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="template sizes in objects")
+    parser.add_argument("--modes", nargs="+", choices=["importjson", "rollout"], default=["importjson", "rollout"])
+    parser.add_argument("--scale", type=float, default=0.01, help="time compression factor (0.01 = 100x faster than real time)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for latency jitter")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.modes, args.scale, args.seed))
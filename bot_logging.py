@@ -0,0 +1,124 @@
+# bot_logging.py
+# Logging for the bot process. Log calls only put the record on a queue;
+# a background listener thread does the formatting and the writing, so a
+# slow stdout pipe or disk never blocks the event loop.
+#
+# Records are written as JSON lines to a rotating file and as plain text to
+# stderr. Repeated warnings/errors from the same call site are rate limited
+# and then sampled, so an error path firing in every guild can't flood the
+# log.
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+LOG_DIR = "logs"
+LOG_FILE = "utilitation.jsonl"
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate at 10 MiB
+LOG_BACKUPS = 5
+LOG_LEVEL = os.environ.get("UTILITATION_LOG_LEVEL", "INFO")
+
+NOISY_WINDOW = 60.0               # Seconds per rate limit window, per call site
+NOISY_BURST = 10                  # Warnings/errors let through per window before sampling
+NOISY_SAMPLE_EVERY = 100          # After the burst, keep 1 in this many
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "suppressed"}
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, extras and the traceback if any."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value if isinstance(value, (str, int, float, bool, type(None))) else repr(value)
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class NoisyFilter(logging.Filter):
+    """Rate limits WARNING and above per call site, then samples.
+
+    Lets NOISY_BURST records per NOISY_WINDOW through for each
+    (logger, file, line), then 1 in NOISY_SAMPLE_EVERY. The next record that
+    passes carries how many were dropped in ``suppressed``.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._sites: Dict[Tuple[str, str, int], list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [window_start, passed_in_window, seen_after_burst, suppressed]
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= NOISY_WINDOW:
+                site = self._sites[key] = [now, 0, 0, site[3] if site else 0]
+            if site[1] < NOISY_BURST:
+                site[1] += 1
+            else:
+                site[2] += 1
+                if site[2] % NOISY_SAMPLE_EVERY:
+                    site[3] += 1
+                    return False
+            record.suppressed, site[3] = site[3], 0
+        return True
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge msg % args here so mutable args can't change later; tracebacks
+        # and JSON are rendered on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(file_suffix: str = ""):
+    """Route every logger through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+    os.makedirs(LOG_DIR, exist_ok=True)
+    name, ext = os.path.splitext(LOG_FILE)
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, f"{name}{file_suffix}{ext}"),
+        maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding="utf-8",
+    )
+    file_handler.setFormatter(JsonLineFormatter())
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(name)s: %(message)s"))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _EnqueueHandler(log_queue)
+    handler.addFilter(NoisyFilter())
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
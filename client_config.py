@@ -0,0 +1,115 @@
+# client_config.py
+# Gateway settings for every client the bot runs. Each client only asks for
+# the events it uses and keeps no message or member cache it doesn't need,
+# which is what lets one small box sit in thousands of guilds.
+#
+# Set UTILITATION_MEASURE=1 to log events/second per client and the
+# process's resident memory every MEASURE_INTERVAL seconds.
+import asyncio
+import logging
+import os
+import resource
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import discord
+
+# ====== PROFILES ======
+# intents:           gateway intents to enable, everything else is off
+# max_messages:      message cache size, None disables it
+# cache_members:     keep members seen in events (the bot's own member is always cached)
+# chunk_at_startup:  request full member lists on connect
+CLIENT_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Prefix commands need message content, in guilds and DMs; nothing reads old messages
+    "main": {
+        "intents": ("guilds", "guild_messages", "dm_messages", "message_content"),
+        "max_messages": None,
+        "cache_members": False,
+        "chunk_at_startup": False,
+    },
+    # Puppets only react to new guild messages starting with << / >>
+    "puppet": {
+        "intents": ("guilds", "guild_messages", "message_content"),
+        "max_messages": None,
+        "cache_members": False,
+        "chunk_at_startup": False,
+    },
+}
+
+MEASURE_EVENTS = os.environ.get("UTILITATION_MEASURE") == "1"
+MEASURE_INTERVAL = 60             # Seconds between measurement reports
+
+log = logging.getLogger(__name__)
+
+
+def client_options(profile: str) -> Dict[str, Any]:
+    """Keyword arguments for discord.Client / commands.Bot built from a profile."""
+    cfg = CLIENT_PROFILES[profile]
+    intents = discord.Intents.none()
+    for name in cfg["intents"]:
+        setattr(intents, name, True)
+    return {
+        "intents": intents,
+        "max_messages": cfg["max_messages"],
+        "member_cache_flags": discord.MemberCacheFlags.from_intents(intents) if cfg["cache_members"] else discord.MemberCacheFlags.none(),
+        "chunk_guilds_at_startup": cfg["chunk_at_startup"],
+        # Needed for on_socket_event_type, which the event meter counts
+        "enable_debug_events": MEASURE_EVENTS,
+    }
+
+
+# ====== MEASUREMENT ======
+def resident_memory_mb() -> float:
+    """Current RSS from /proc where available, else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1_048_576
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class EventMeter:
+    """Counts raw gateway events per client and logs rates periodically.
+
+    All clients share one process (see runner.py), so memory is reported for
+    the process along with each client's cache sizes.
+    """
+
+    def __init__(self, interval: float = MEASURE_INTERVAL):
+        self.interval = interval
+        self._clients: List[Tuple[str, discord.Client]] = []
+        self._counts: Counter = Counter()
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, name: str, client: discord.Client):
+        if not MEASURE_EVENTS:
+            return
+        self._clients.append((name, client))
+
+        async def on_socket_event_type(event_type: str):
+            self._counts[name] += 1
+
+        client.on_socket_event_type = on_socket_event_type
+
+    def start(self):
+        if MEASURE_EVENTS and self._task is None:
+            self._task = asyncio.create_task(self._report_loop(), name="event-meter")
+
+    async def _report_loop(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            counts, self._counts = self._counts, Counter()
+            log.info("📊 RSS %.1f MB", resident_memory_mb())
+            for name, client in self._clients:
+                members = sum(len(g.members) for g in client.guilds)
+                log.info(
+                    "📊 %s: %.1f events/s, %d guilds, %d cached messages, %d cached members",
+                    name, counts[name] / elapsed, len(client.guilds), len(client.cached_messages), members,
+                )
+
+
+event_meter = EventMeter()
@@ -0,0 +1,127 @@
+# cluster.py
+# Shard layout for main_bot, and a launcher that splits shards across
+# worker processes so gateway decoding for many guilds uses every core.
+#
+# A worker is just main.py started with:
+#   UTILITATION_SHARD_COUNT   total shards across the cluster
+#   UTILITATION_SHARD_IDS     comma separated shard IDs this process runs
+#   UTILITATION_CLUSTER_ID    index of this process (0 is the primary)
+# Without them main.py runs every shard itself, as one process.
+#
+#   UTILITATION_TOKEN=... python cluster.py --processes 4            # shard count from Discord
+#   python cluster.py --processes 4 --shards 16
+#
+# Global work (slash command sync, the puppets, the stock market tick) runs
+# only on the primary process; guild-scoped work belongs to the process whose
+# shards include the guild, see owns_guild().
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import List, Optional
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+
+SHARD_COUNT: Optional[int] = _env_int("UTILITATION_SHARD_COUNT")
+SHARD_IDS: Optional[List[int]] = (
+    [int(s) for s in os.environ["UTILITATION_SHARD_IDS"].split(",")]
+    if os.environ.get("UTILITATION_SHARD_IDS") else None
+)
+CLUSTER_ID: int = _env_int("UTILITATION_CLUSTER_ID") or 0
+IS_PRIMARY_CLUSTER = CLUSTER_ID == 0
+
+RESTART_DELAY = 5                 # Seconds before restarting a crashed worker
+GATEWAY_BOT_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+def shard_for_guild(guild_id: int, shard_count: int) -> int:
+    """Discord's guild -> shard mapping."""
+    return (guild_id >> 22) % shard_count
+
+
+def owns_guild(guild_id: int) -> bool:
+    """Whether this process runs the shard that receives the guild's events."""
+    if SHARD_IDS is None or not SHARD_COUNT:
+        return True
+    return shard_for_guild(guild_id, SHARD_COUNT) in SHARD_IDS
+
+
+def split_shards(shard_count: int, processes: int) -> List[List[int]]:
+    """Contiguous, evenly sized shard ranges, one per process."""
+    processes = max(1, min(processes, shard_count))
+    size, extra = divmod(shard_count, processes)
+    ranges, start = [], 0
+    for i in range(processes):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+def recommended_shards(token: str) -> int:
+    request = urllib.request.Request(GATEWAY_BOT_URL, headers={"Authorization": f"Bot {token}"})
+    with urllib.request.urlopen(request, timeout=10) as resp:
+        return int(json.load(resp)["shards"])
+
+
+# ====== LAUNCHER ======
+def _spawn(cluster_id: int, shard_ids: List[int], shard_count: int) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        UTILITATION_SHARD_COUNT=str(shard_count),
+        UTILITATION_SHARD_IDS=",".join(map(str, shard_ids)),
+        UTILITATION_CLUSTER_ID=str(cluster_id),
+    )
+    print(f"🚀 Cluster {cluster_id}: shards {shard_ids[0]}-{shard_ids[-1]} of {shard_count}")
+    return subprocess.Popen([sys.executable, "main.py"], env=env)
+
+
+def launch(processes: int, shard_count: int):
+    ranges = split_shards(shard_count, processes)
+    workers = {i: _spawn(i, shard_ids, shard_count) for i, shard_ids in enumerate(ranges)}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while not stopping:
+        time.sleep(1)
+        for i, proc in list(workers.items()):
+            if proc.poll() is not None and not stopping:
+                print(f"❌ Cluster {i} exited with {proc.returncode}, restarting in {RESTART_DELAY}s")
+                time.sleep(RESTART_DELAY)
+                workers[i] = _spawn(i, ranges[i], shard_count)
+
+    for proc in workers.values():
+        proc.terminate()
+    for proc in workers.values():
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run main_bot's shards across several processes.")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, help="total shards (default: Discord's recommendation, needs UTILITATION_TOKEN)")
+    args = parser.parse_args()
+    shards = args.shards
+    if shards is None:
+        token = os.environ.get("UTILITATION_TOKEN")
+        if not token:
+            parser.error("pass --shards or set UTILITATION_TOKEN to ask Discord for the shard count")
+        shards = recommended_shards(token)
+    launch(args.processes, shards)
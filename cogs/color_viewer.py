@@ -1,28 +1,40 @@
 # cogs/color_viewer.py
+import io
+
 import discord
 from discord.ext import commands
 from discord import app_commands
 
+from color_names import MAX_COLORS, describe_color, parse_colors
+from swatch import render_palette, render_swatch
+
 class ColorViewer(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    @app_commands.command(name="color", description="Display a color preview from HEX code.")
-    async def color(self, interaction: discord.Interaction, hex_code: str):
-        if not hex_code.startswith("#"):
-            hex_code = "#" + hex_code
-
-        if len(hex_code) != 7:
-            return await interaction.response.send_message("❌ Invalid HEX color format. Use format like `#FF5733`.", ephemeral=True)
-
-        try:
-            int(hex_code[1:], 16)
-        except ValueError:
-            return await interaction.response.send_message("❌ Not a valid HEX value.", ephemeral=True)
+    @app_commands.command(name="color", description="Preview colors: HEX (#FF5733, #F53) or names (tomato), several separated by commas.")
+    @app_commands.describe(colors="One or more colors separated by commas, e.g. `#FF5733, navy, light gray`")
+    async def color(self, interaction: discord.Interaction, colors: str):
+        values, invalid = parse_colors(colors)
+        if invalid:
+            shown = ", ".join(f"`{part}`" for part in invalid[:5])
+            return await interaction.response.send_message(
+                f"❌ Not a color: {shown}. Use HEX like `#FF5733` / `#F53` or a CSS color name like `tomato`.", ephemeral=True
+            )
+        if not values:
+            return await interaction.response.send_message("❌ Give at least one color, e.g. `#FF5733`.", ephemeral=True)
+        if len(values) > MAX_COLORS:
+            return await interaction.response.send_message(f"❌ At most {MAX_COLORS} colors at once.", ephemeral=True)
 
-        embed = discord.Embed(title=f"Color Preview: {hex_code}", color=int(hex_code[1:], 16))
-        embed.set_image(url=f"https://singlecolorimage.com/get/{hex_code[1:]}/400x100")
-        await interaction.response.send_message(embed=embed)
+        # Rendered here and attached, no external image host involved
+        if len(values) == 1:
+            png, title = render_swatch(values[0]), f"Color Preview: #{values[0]:06X}"
+        else:
+            png, title = render_palette(tuple(values)), f"Palette Preview: {len(values)} colors"
+        file = discord.File(io.BytesIO(png), filename="swatch.png")
+        embed = discord.Embed(title=title, description="\n".join(describe_color(v) for v in values), color=values[0])
+        embed.set_image(url="attachment://swatch.png")
+        await interaction.response.send_message(embed=embed, file=file)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(ColorViewer(bot))
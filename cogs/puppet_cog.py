@@ -1,41 +1,39 @@
+import logging
+
 import discord
-from discord.ext import commands, tasks
-import asyncio
+from discord.ext import commands
+
+from client_config import client_options, event_meter
+from cluster import IS_PRIMARY_CLUSTER
+from puppet_relay import PuppetRelay
 
 # Replace this with your Utilitation 2 bot token
 SECONDARY_BOT_TOKEN = "sorry, no API keys for you today"
 
-# Intents for secondary bot
-puppet_intents = discord.Intents.default()
-puppet_intents.message_content = True
-puppet_intents.guilds = True
-puppet_intents.messages = True
+log = logging.getLogger(__name__)
 
-# Secondary client (Utilitation 2)
-puppet_bot = discord.Client(intents=puppet_intents)
+# Secondary client (Utilitation 2); intents and caches come from client_config
+puppet_bot = discord.Client(**client_options("puppet"))
+event_meter.watch("puppet >>", puppet_bot)
+puppet_relay = PuppetRelay(puppet_bot)
 
 class PuppetCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.start_puppet_bot.start()
 
-    def cog_unload(self):
-        self.start_puppet_bot.cancel()
+    # The main bot's runner hosts puppet_bot on the same loop and HTTP connector,
+    # in the primary cluster process only so the puppet connects once
+    async def cog_load(self):
+        if IS_PRIMARY_CLUSTER:
+            await self.bot.runner.attach(puppet_bot, SECONDARY_BOT_TOKEN)
 
-    @tasks.loop(count=1)
-    async def start_puppet_bot(self):
-        # Run puppet_bot in a background thread
-        loop = asyncio.get_event_loop()
-        loop.create_task(puppet_bot.start(SECONDARY_BOT_TOKEN))
-
-    @start_puppet_bot.before_loop
-    async def before_start(self):
-        await self.bot.wait_until_ready()
+    async def cog_unload(self):
+        await self.bot.runner.detach(puppet_bot)
 
 # Message handling for the secondary bot
 @puppet_bot.event
 async def on_ready():
-    print(f"🤖 Utilitation 2 (puppet) ready as {puppet_bot.user}")
+    log.info("🤖 Utilitation 2 (puppet) ready as %s", puppet_bot.user)
 
 @puppet_bot.event
 async def on_message(message):
@@ -44,18 +42,7 @@ async def on_message(message):
 
     if message.content.startswith(">>"):
         new_content = message.content[2:].lstrip()
-
-        try:
-            await message.delete()
-        except discord.Forbidden:
-            print(f"❌ Can't delete message in {message.channel}")
-        except discord.HTTPException as e:
-            print(f"❌ Failed to delete message: {e}")
-
-        try:
-            await message.channel.send(new_content)
-        except Exception as e:
-            print(f"❌ Failed to resend message: {e}")
+        await puppet_relay.relay(message, new_content)
 
 # Setup for main bot to load the cog
 async def setup(bot):
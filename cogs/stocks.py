@@ -1,13 +1,22 @@
 import asyncio
+import logging
 import random
 import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from collections import OrderedDict
 from contextlib import closing
+from itertools import accumulate
 from typing import Optional, Tuple, List
 
 import discord
 from discord import app_commands
 from discord.ext import commands, tasks
 
+from cluster import IS_PRIMARY_CLUSTER, SHARD_IDS
+
 # ============================
 # Config
 # ============================
@@ -16,13 +25,57 @@ PRICE_TICK_SECONDS = 600          # 10 minutes between market ticks
 DAILY_DRIFT_PCT = 0.01            # Small mean reversion drift (1%)
 MAX_JITTER_PCT = 0.05             # Max +/- 5% move per tick
 MIN_PRICE = 1.0                   # Floor to avoid zero/negative prices
+PAYOUT_INTERVAL_SECONDS = 86400   # Dividends and interest are paid once a day
+PAYOUT_CHECK_SECONDS = 600        # How often to check whether a payout is due
+INTEREST_RATE = 0.001             # Interest per payout on positive balances (0.1%)
+ARCHIVE_AFTER_DAYS = 7            # price_history samples older than this move to price_archive
+DAY_SECONDS = 86400
+PORTFOLIO_CACHE_SIZE = 4096       # Portfolio snapshots kept between ticks
+INDEX_BASE = 1000.0               # Starting level of the market index and each sector index
+MARKET_INDEX = ""                 # index_history.sector value for the whole-market index
+
+log = logging.getLogger(__name__)
 
 # Note on resource limits:
 # - Uses only sqlite3 and small background loop.
-# - No in-memory caches for large datasets; queries are on-demand.
+# - No in-memory caches for large datasets; queries are on-demand, except a
+#   bounded cache of portfolio snapshots that lives for one tick.
 # - Table schemas are minimal.
 
 
+# ============================
+# Price archive encoding
+# ============================
+# One blob per company per UTC day: the sample count, then every timestamp
+# (seconds into the day) and every price (integer cents) as deltas from the
+# previous one, as little-endian int64s, zlib-compressed. Prices move a few
+# cents per tick, so the deltas are small and compress very well.
+def encode_day(day_start: int, samples: List[Tuple[int, float]]) -> bytes:
+    ts_deltas, price_deltas = array("q"), array("q")
+    prev_ts, prev_cents = day_start, 0
+    for ts, price in samples:
+        cents = round(price * 100)
+        ts_deltas.append(ts - prev_ts)
+        price_deltas.append(cents - prev_cents)
+        prev_ts, prev_cents = ts, cents
+    body = array("q", [len(samples)]) + ts_deltas + price_deltas
+    if sys.byteorder != "little":
+        body.byteswap()
+    return zlib.compress(body.tobytes(), 9)
+
+
+def decode_day(day_start: int, blob: bytes) -> Tuple[array, array]:
+    """(timestamps as array('q'), prices as array('d')) for one archived day."""
+    body = array("q")
+    body.frombytes(zlib.decompress(blob))
+    if sys.byteorder != "little":
+        body.byteswap()
+    count = body[0]
+    ts = array("q", accumulate(body[1:1 + count], initial=day_start))[1:]
+    prices = array("d", (cents / 100 for cents in accumulate(body[1 + count:1 + 2 * count])))
+    return ts, prices
+
+
 # ============================
 # Helper / DB layer
 # ============================
@@ -68,6 +121,19 @@ class StockDB:
                 );
                 """
             )
+            # Dividend yield per payout, as a fraction of the share price
+            cur.execute("PRAGMA table_info(companies)")
+            columns = {row[1] for row in cur.fetchall()}
+            if "dividend_yield" not in columns:
+                cur.execute("ALTER TABLE companies ADD COLUMN dividend_yield REAL NOT NULL DEFAULT 0")
+            if "sector" not in columns:
+                cur.execute("ALTER TABLE companies ADD COLUMN sector TEXT")
+            # Total shares held by players, kept up to date by set_shares; the index weights by it
+            if "held_shares" not in columns:
+                cur.execute("ALTER TABLE companies ADD COLUMN held_shares INTEGER NOT NULL DEFAULT 0")
+                cur.execute(
+                    "UPDATE companies SET held_shares = (SELECT COALESCE(SUM(shares), 0) FROM holdings WHERE company_id = companies.id)"
+                )
             # Simple price history (optional, trimmed)
             cur.execute(
                 """
@@ -78,6 +144,45 @@ class StockDB:
                 );
                 """
             )
+            cur.execute("CREATE INDEX IF NOT EXISTS price_history_company_ts ON price_history (company_id, ts)")
+            # Market and sector index levels, one row per index per tick
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS index_history (
+                    ts INTEGER NOT NULL,
+                    sector TEXT NOT NULL,
+                    level REAL NOT NULL,
+                    change REAL NOT NULL
+                );
+                """
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS index_history_ts ON index_history (ts)")
+            # Archived price history, see encode_day()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS price_archive (
+                    company_id INTEGER NOT NULL,
+                    day INTEGER NOT NULL,
+                    samples INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (company_id, day)
+                );
+                """
+            )
+            # One summary row per payout (per company for dividends)
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS payouts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts INTEGER NOT NULL,
+                    kind TEXT NOT NULL,
+                    company_id INTEGER,
+                    rate REAL NOT NULL,
+                    recipients INTEGER NOT NULL,
+                    total REAL NOT NULL
+                );
+                """
+            )
             con.commit()
 
     # ---------- Companies ----------
@@ -121,6 +226,20 @@ class StockDB:
             cur.execute("SELECT id, name, price FROM companies ORDER BY name COLLATE NOCASE")
             return cur.fetchall()
 
+    def list_market(self) -> List[Tuple[int, str, float, Optional[str], int]]:
+        """Returns list of (id, name, price, sector, held_shares)."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("SELECT id, name, price, sector, held_shares FROM companies ORDER BY name COLLATE NOCASE")
+            return cur.fetchall()
+
+    def set_sector(self, name: str, sector: Optional[str]) -> bool:
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("UPDATE companies SET sector = ? WHERE name = ?", (sector, name))
+            con.commit()
+            return cur.rowcount > 0
+
     def update_price_by_id(self, company_id: int, new_price: float):
         with self._connect() as con:
             cur = con.cursor()
@@ -129,6 +248,115 @@ class StockDB:
             cur.execute("INSERT INTO price_history (company_id, ts, price) VALUES (?, strftime('%s','now'), ?)", (company_id, new_price))
             con.commit()
 
+    def set_dividend(self, name: str, dividend_yield: float) -> bool:
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("UPDATE companies SET dividend_yield = ? WHERE name = ?", (dividend_yield, name))
+            con.commit()
+            return cur.rowcount > 0
+
+    # ---------- Market index ----------
+    def latest_index(self) -> List[Tuple[str, float, float]]:
+        """Returns (sector, level, change since previous tick) from the last tick; sector MARKET_INDEX is the whole market."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                """
+                SELECT sector, level, change FROM index_history
+                WHERE ts = (SELECT MAX(ts) FROM index_history)
+                ORDER BY sector COLLATE NOCASE
+                """
+            )
+            return cur.fetchall()
+
+    def record_index(self, ts: int, levels: List[Tuple[str, float, float]]):
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.executemany(
+                "INSERT INTO index_history (ts, sector, level, change) VALUES (?, ?, ?, ?)",
+                [(ts, sector, level, change) for sector, level, change in levels],
+            )
+            con.commit()
+
+    # ---------- Price archive ----------
+    def archive_history(self, before_ts: int) -> int:
+        """Moves price_history samples from whole days before before_ts into price_archive.
+
+        Works one company-day per short transaction so trades and market ticks
+        aren't locked out while a backlog is archived. Days that already have a
+        blob are merged. Returns the number of samples moved.
+        """
+        cutoff = before_ts - before_ts % DAY_SECONDS
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                "SELECT DISTINCT company_id, ts - ts % ? FROM price_history WHERE ts < ?",
+                (DAY_SECONDS, cutoff),
+            )
+            days = cur.fetchall()
+        moved = 0
+        for company_id, day in days:
+            moved += self._archive_day(company_id, day)
+        return moved
+
+    def _archive_day(self, company_id: int, day: int) -> int:
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute(
+                "SELECT ts, price FROM price_history WHERE company_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (company_id, day, day + DAY_SECONDS),
+            )
+            samples = cur.fetchall()
+            if not samples:
+                return 0
+            moved = len(samples)
+            cur.execute("SELECT data FROM price_archive WHERE company_id = ? AND day = ?", (company_id, day))
+            row = cur.fetchone()
+            if row:
+                samples = sorted(list(zip(*decode_day(day, row[0]))) + samples)
+            cur.execute(
+                "INSERT OR REPLACE INTO price_archive (company_id, day, samples, data) VALUES (?, ?, ?, ?)",
+                (company_id, day, len(samples), encode_day(day, samples)),
+            )
+            cur.execute(
+                "DELETE FROM price_history WHERE company_id = ? AND ts >= ? AND ts < ?",
+                (company_id, day, day + DAY_SECONDS),
+            )
+            con.commit()
+            return moved
+
+    def read_history(self, company_id: int, start_ts: int, end_ts: int) -> Tuple[array, array]:
+        """Price samples with start_ts <= ts < end_ts, archived or not, as (array('q') ts, array('d') prices)."""
+        ts_out, price_out = array("q"), array("d")
+        with self._connect() as con:
+            cur = con.cursor()
+            # One read transaction: a day archived between the two reads would be in neither
+            cur.execute("BEGIN")
+            cur.execute(
+                "SELECT day, data FROM price_archive WHERE company_id = ? AND day >= ? AND day < ? ORDER BY day",
+                (company_id, start_ts - start_ts % DAY_SECONDS, end_ts),
+            )
+            for day, blob in cur.fetchall():
+                ts, prices = decode_day(day, blob)
+                if start_ts <= ts[0] and ts[-1] < end_ts:
+                    ts_out += ts
+                    price_out += prices
+                    continue
+                for t, p in zip(ts, prices):
+                    if start_ts <= t < end_ts:
+                        ts_out.append(t)
+                        price_out.append(p)
+            cur.execute(
+                "SELECT ts, price FROM price_history WHERE company_id = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (company_id, start_ts, end_ts),
+            )
+            for t, p in cur.fetchall():
+                ts_out.append(t)
+                price_out.append(p)
+            con.commit()
+        return ts_out, price_out
+
     # ---------- Balances ----------
     def get_balance(self, user_id: int) -> float:
         with self._connect() as con:
@@ -146,13 +374,27 @@ class StockDB:
             )
             con.commit()
 
+    # Cluster processes share this DB and balances aren't per guild, so every
+    # read-check-write on a balance or holding happens inside one BEGIN
+    # IMMEDIATE transaction with a guarded UPDATE.
     def add_balance(self, user_id: int, delta: float) -> float:
-        bal = self.get_balance(user_id)
-        bal += delta
-        if bal < 0:
-            raise ValueError("Insufficient funds")
-        self.set_balance(user_id, bal)
-        return bal
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            if delta >= 0:
+                cur.execute(
+                    "INSERT INTO balances (user_id, balance) VALUES (?, ?)\n                     ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance",
+                    (user_id, delta),
+                )
+            else:
+                cur.execute(
+                    "UPDATE balances SET balance = balance + ? WHERE user_id = ? AND balance >= ?",
+                    (delta, user_id, -delta),
+                )
+                if cur.rowcount == 0:
+                    raise ValueError("Insufficient funds")
+            cur.execute("SELECT balance FROM balances WHERE user_id = ?", (user_id,))
+            return float(cur.fetchone()[0])
 
     # ---------- Holdings ----------
     def get_shares(self, user_id: int, company_id: int) -> int:
@@ -168,6 +410,12 @@ class StockDB:
     def set_shares(self, user_id: int, company_id: int, shares: int):
         with self._connect() as con:
             cur = con.cursor()
+            cur.execute(
+                "SELECT shares FROM holdings WHERE user_id = ? AND company_id = ?",
+                (user_id, company_id),
+            )
+            row = cur.fetchone()
+            held_delta = max(shares, 0) - (row[0] if row else 0)
             if shares <= 0:
                 cur.execute(
                     "DELETE FROM holdings WHERE user_id = ? AND company_id = ?",
@@ -178,8 +426,76 @@ class StockDB:
                     "INSERT INTO holdings (user_id, company_id, shares) VALUES (?, ?, ?)\n                     ON CONFLICT(user_id, company_id) DO UPDATE SET shares = excluded.shares",
                     (user_id, company_id, shares),
                 )
+            cur.execute("UPDATE companies SET held_shares = held_shares + ? WHERE id = ?", (held_delta, company_id))
             con.commit()
 
+    def buy(self, user_id: int, company_id: int, shares: int) -> Optional[Tuple[bool, float, float, float]]:
+        """Pays for shares at the current price and adds them, atomically.
+
+        Returns (done, price, cost, balance), balance being what the user has if not done,
+        or None if the company no longer exists.
+        """
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT price FROM companies WHERE id = ?", (company_id,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            price = row[0]
+            cost = round(price * shares, 2)
+            cur.execute(
+                "UPDATE balances SET balance = balance - ? WHERE user_id = ? AND balance >= ?",
+                (cost, user_id, cost),
+            )
+            if cur.rowcount == 0:
+                cur.execute("SELECT balance FROM balances WHERE user_id = ?", (user_id,))
+                row = cur.fetchone()
+                return False, price, cost, float(row[0]) if row else 0.0
+            cur.execute(
+                "INSERT INTO holdings (user_id, company_id, shares) VALUES (?, ?, ?)\n                 ON CONFLICT(user_id, company_id) DO UPDATE SET shares = shares + excluded.shares",
+                (user_id, company_id, shares),
+            )
+            cur.execute("UPDATE companies SET held_shares = held_shares + ? WHERE id = ?", (shares, company_id))
+            cur.execute("SELECT balance FROM balances WHERE user_id = ?", (user_id,))
+            return True, price, cost, float(cur.fetchone()[0])
+
+    def sell(self, user_id: int, company_id: int, shares: int) -> Optional[Tuple[bool, float, float, int]]:
+        """Removes shares and credits them at the current price, atomically.
+
+        Returns (done, price, proceeds, shares owned before), or None if the company no longer exists.
+        """
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT price FROM companies WHERE id = ?", (company_id,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            price = row[0]
+            proceeds = round(price * shares, 2)
+            cur.execute(
+                "SELECT shares FROM holdings WHERE user_id = ? AND company_id = ?",
+                (user_id, company_id),
+            )
+            row = cur.fetchone()
+            owned = int(row[0]) if row else 0
+            if owned < shares:
+                return False, price, proceeds, owned
+            if owned == shares:
+                cur.execute("DELETE FROM holdings WHERE user_id = ? AND company_id = ?", (user_id, company_id))
+            else:
+                cur.execute(
+                    "UPDATE holdings SET shares = shares - ? WHERE user_id = ? AND company_id = ?",
+                    (shares, user_id, company_id),
+                )
+            cur.execute("UPDATE companies SET held_shares = held_shares - ? WHERE id = ?", (shares, company_id))
+            cur.execute(
+                "INSERT INTO balances (user_id, balance) VALUES (?, ?)\n                 ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance",
+                (user_id, proceeds),
+            )
+            return True, price, proceeds, owned
+
     def get_portfolio(self, user_id: int) -> List[Tuple[str, int, float]]:
         """Returns list of (company_name, shares, current_price)."""
         with self._connect() as con:
@@ -196,6 +512,101 @@ class StockDB:
             )
             return cur.fetchall()
 
+    def get_portfolio_snapshot(self, user_id: int) -> Tuple[List[Tuple[str, int, float, float]], float, float]:
+        """Returns ([(company_name, shares, price, value)], balance, holdings_value) in one query."""
+        with self._connect() as con:
+            cur = con.cursor()
+            # Always one row for the user, even without balance or holdings
+            cur.execute(
+                """
+                SELECT c.name, h.shares, c.price, ROUND(c.price * h.shares, 2),
+                       COALESCE(b.balance, 0), COALESCE(SUM(ROUND(c.price * h.shares, 2)) OVER (), 0)
+                FROM (SELECT ? AS user_id) u
+                LEFT JOIN balances b ON b.user_id = u.user_id
+                LEFT JOIN (holdings h JOIN companies c ON c.id = h.company_id)
+                    ON h.user_id = u.user_id AND h.shares > 0
+                ORDER BY c.name COLLATE NOCASE
+                """,
+                (user_id,),
+            )
+            rows = cur.fetchall()
+        holdings = [(name, shares, price, value) for name, shares, price, value, _b, _t in rows if name is not None]
+        return holdings, float(rows[0][4]), float(rows[0][5])
+
+    # ---------- Payouts ----------
+    # Each payout is a fixed number of statements regardless of how many users
+    # it pays. The due-check and both payouts share one transaction, so a
+    # payout is either made in full or not at all, and two processes (or a
+    # reloaded cog) racing for the same payout can't both make it.
+    def pay_daily(self, ts: int, interval: int, rate: float) -> bool:
+        """Pays dividends and interest if the last payout is at least interval seconds old. True if it paid."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT MAX(ts) FROM payouts")
+            last = cur.fetchone()[0]
+            if last is not None and ts - last < interval:
+                return False
+            self._pay_dividends(cur, ts)
+            self._pay_interest(cur, rate, ts)
+            con.commit()
+            return True
+
+    def _pay_dividends(self, cur, ts: int):
+        """Pays every company's dividend to its holders, with one summary row per company."""
+        cur.execute(
+            """
+            INSERT INTO payouts (ts, kind, company_id, rate, recipients, total)
+            SELECT ?, 'dividend', c.id, c.dividend_yield, COUNT(*), SUM(ROUND(h.shares * c.price * c.dividend_yield, 2))
+            FROM holdings h
+            JOIN companies c ON c.id = h.company_id
+            WHERE c.dividend_yield > 0 AND h.shares > 0
+            GROUP BY c.id
+            """,
+            (ts,),
+        )
+        # Holders without a balance row get one
+        cur.execute(
+            """
+            INSERT INTO balances (user_id, balance)
+            SELECT h.user_id, SUM(ROUND(h.shares * c.price * c.dividend_yield, 2))
+            FROM holdings h
+            JOIN companies c ON c.id = h.company_id
+            WHERE c.dividend_yield > 0 AND h.shares > 0
+            GROUP BY h.user_id
+            ON CONFLICT(user_id) DO UPDATE SET balance = balance + excluded.balance
+            """
+        )
+
+    def _pay_interest(self, cur, rate: float, ts: int):
+        """Adds interest to every positive balance. Always writes its summary row, which marks the payout as made."""
+        cur.execute(
+            """
+            INSERT INTO payouts (ts, kind, company_id, rate, recipients, total)
+            SELECT ?, 'interest', NULL, ?, COUNT(*), COALESCE(SUM(ROUND(balance * ?, 2)), 0)
+            FROM balances
+            WHERE balance > 0
+            """,
+            (ts, rate, rate),
+        )
+        cur.execute("UPDATE balances SET balance = balance + ROUND(balance * ?, 2) WHERE balance > 0", (rate,))
+
+    def recent_payouts(self, limit: int = 10) -> List[Tuple[int, str, Optional[str], float, int, float]]:
+        """Returns list of (ts, kind, company_name or None, rate, recipients, total), newest first."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                """
+                SELECT p.ts, p.kind, c.name, p.rate, p.recipients, p.total
+                FROM payouts p
+                LEFT JOIN companies c ON c.id = p.company_id
+                ORDER BY p.id DESC
+                LIMIT ?
+                """,
+                (limit,),
+            )
+            return cur.fetchall()
+
 
 # ============================
 # Cog
@@ -203,11 +614,24 @@ class StockDB:
 class Stocks(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.db = StockDB(DB_PATH)
-        self.market_tick.start()
+        # On a hot reload, pick up the previous instance's DB and tick schedule
+        handover = getattr(bot, "stocks_handover", None) or {}
+        bot.stocks_handover = None
+        self.db = handover.get("db") or StockDB(DB_PATH)
+        self._resume_tick_at = handover.get("next_tick")
+        # user_id -> (tick version, snapshot). Under cluster.py other processes trade
+        # and move prices without this one noticing, so the cache is single-process only.
+        self._tick_version = 0
+        self._portfolios: "OrderedDict[int, Tuple[int, tuple]]" = OrderedDict()
+        # The market is shared by every guild, so only one cluster process moves prices
+        if IS_PRIMARY_CLUSTER:
+            self.market_tick.start()
+            self.payout_tick.start()
 
     def cog_unload(self):
+        self.bot.stocks_handover = {"db": self.db, "next_tick": self.market_tick.next_iteration or self._resume_tick_at}
         self.market_tick.cancel()
+        self.payout_tick.cancel()
 
     # --------------------------
     # Background price simulation
@@ -215,23 +639,84 @@ class Stocks(commands.Cog):
     @tasks.loop(seconds=PRICE_TICK_SECONDS)
     async def market_tick(self):
         # Random, bounded jitter with a slight drift upward to keep activity interesting
-        companies = self.db.list_companies()
-        for cid, name, price in companies:
+        companies = self.db.list_market()
+        # Index and sector -> [cap before, cap after, sum of price ratios, companies];
+        # each company's move is added in O(1), nothing is recomputed from holdings
+        moves = {}
+        for cid, name, price, sector, held in companies:
             if price <= 0:
                 price = MIN_PRICE
             jitter = random.uniform(-MAX_JITTER_PCT, MAX_JITTER_PCT)
             drift = DAILY_DRIFT_PCT * (random.random() - 0.5)  # centered around 0
             new_price = max(MIN_PRICE, round(price * (1 + jitter + drift), 2))
             self.db.update_price_by_id(cid, new_price)
+            for key in (MARKET_INDEX, sector) if sector else (MARKET_INDEX,):
+                acc = moves.setdefault(key, [0.0, 0.0, 0.0, 0])
+                acc[0] += price * held
+                acc[1] += new_price * held
+                acc[2] += new_price / price
+                acc[3] += 1
+        self._update_index(moves)
+        self._new_tick()
         # Avoid spamming logs; this loop is intentionally quiet.
 
+    def _update_index(self, moves):
+        """Moves each index by its cap-weighted return; equal-weighted while nobody holds shares in it."""
+        previous = {sector: level for sector, level, _change in self.db.latest_index()}
+        levels = []
+        for key, (cap_before, cap_after, ratio_sum, count) in moves.items():
+            ratio = cap_after / cap_before if cap_before else ratio_sum / count
+            before = previous.get(key, INDEX_BASE)
+            levels.append((key, round(before * ratio, 2), ratio - 1))
+        if levels:
+            self.db.record_index(int(time.time()), levels)
+
     @market_tick.before_loop
     async def before_tick(self):
         await self.bot.wait_until_ready()
+        # Keep the old schedule instead of ticking immediately after a reload
+        if self._resume_tick_at:
+            await discord.utils.sleep_until(self._resume_tick_at)
+
+    # --------------------------
+    # Dividends & interest
+    # --------------------------
+    @tasks.loop(seconds=PAYOUT_CHECK_SECONDS)
+    async def payout_tick(self):
+        # The schedule lives in the payouts table and is checked in the same
+        # transaction that pays, so restarts and reloads don't pay twice.
+        # Off the event loop: a payout touches every holder.
+        now = int(time.time())
+        try:
+            paid = await asyncio.to_thread(self.db.pay_daily, now, PAYOUT_INTERVAL_SECONDS, INTEREST_RATE)
+        except sqlite3.OperationalError as e:
+            log.warning("Payout failed, retrying at the next check: %s", e)
+            return
+        if not paid:
+            return
+        self._new_tick()
+        # Daily housekeeping: compact old price samples. Days left over after an
+        # error stay in price_history and are picked up by the next run.
+        try:
+            await asyncio.to_thread(self.db.archive_history, now - ARCHIVE_AFTER_DAYS * DAY_SECONDS)
+        except sqlite3.OperationalError as e:
+            log.warning("Price history archival stopped early: %s", e)
+
+    @payout_tick.before_loop
+    async def before_payout(self):
+        await self.bot.wait_until_ready()
 
     # ============================
     # Utilities
     # ============================
+    def _new_tick(self):
+        """Prices or every balance changed: all cached portfolios are stale."""
+        self._tick_version += 1
+        self._portfolios.clear()
+
+    def _invalidate_portfolio(self, user_id: int):
+        self._portfolios.pop(user_id, None)
+
     async def _ensure_company(self, name: str) -> Tuple[int, str, float]:
         row = self.db.get_company(name)
         if not row:
@@ -273,6 +758,7 @@ class Stocks(commands.Cog):
     @admin_check()
     async def removestock_prefix(self, ctx: commands.Context, name: str):
         ok = self.db.remove_company(name)
+        self._new_tick()
         if ok:
             await ctx.reply(f"🗑️ Company **{name}** delisted and holdings cleared.")
         else:
@@ -282,6 +768,7 @@ class Stocks(commands.Cog):
     @app_commands.checks.has_permissions(manage_guild=True)
     async def removestock_slash(self, interaction: discord.Interaction, name: str):
         ok = self.db.remove_company(name)
+        self._new_tick()
         if ok:
             await interaction.response.send_message(
                 f"🗑️ Company **{name}** delisted and holdings cleared.", ephemeral=True
@@ -294,6 +781,7 @@ class Stocks(commands.Cog):
     async def setprice_prefix(self, ctx: commands.Context, name: str, new_price: float):
         new_price = round(float(new_price), 2)
         ok = self.db.set_price(name, new_price)
+        self._new_tick()
         if ok:
             await ctx.reply(f"🔧 **{name}** price set to **{new_price:.2f}**.")
         else:
@@ -304,6 +792,7 @@ class Stocks(commands.Cog):
     async def setprice_slash(self, interaction: discord.Interaction, name: str, new_price: float):
         new_price = round(float(new_price), 2)
         ok = self.db.set_price(name, new_price)
+        self._new_tick()
         if ok:
             await interaction.response.send_message(
                 f"🔧 **{name}** price set to **{new_price:.2f}**.", ephemeral=True
@@ -311,6 +800,53 @@ class Stocks(commands.Cog):
         else:
             await interaction.response.send_message("❌ Company not found.", ephemeral=True)
 
+    @commands.command(name="setdividend")
+    @admin_check()
+    async def setdividend_prefix(self, ctx: commands.Context, name: str, yield_pct: float):
+        """Daily dividend as a percent of the share price. Example: !setdividend Halberd_Arms 0.5"""
+        if yield_pct < 0:
+            return await ctx.reply("Dividend can't be negative.")
+        ok = self.db.set_dividend(name, yield_pct / 100)
+        if ok:
+            await ctx.reply(f"💸 **{name}** now pays **{yield_pct:g}%** of its price per share daily.")
+        else:
+            await ctx.reply("❌ Company not found.")
+
+    @app_commands.command(name="setdividend", description="Set a company's daily dividend (% of share price)")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def setdividend_slash(self, interaction: discord.Interaction, name: str, yield_pct: float):
+        if yield_pct < 0:
+            return await interaction.response.send_message("Dividend can't be negative.", ephemeral=True)
+        ok = self.db.set_dividend(name, yield_pct / 100)
+        if ok:
+            await interaction.response.send_message(
+                f"💸 **{name}** now pays **{yield_pct:g}%** of its price per share daily.", ephemeral=True
+            )
+        else:
+            await interaction.response.send_message("❌ Company not found.", ephemeral=True)
+
+    @commands.command(name="setsector")
+    @admin_check()
+    async def setsector_prefix(self, ctx: commands.Context, name: str, *, sector: Optional[str] = None):
+        """Put a company in a sector for the sector indexes. Example: !setsector Halberd_Arms Defense"""
+        ok = self.db.set_sector(name, sector)
+        if ok:
+            await ctx.reply(f"🏷️ **{name}** is now in sector **{sector}**." if sector else f"🏷️ **{name}** no longer has a sector.")
+        else:
+            await ctx.reply("❌ Company not found.")
+
+    @app_commands.command(name="setsector", description="Set a company's sector (leave empty to clear)")
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def setsector_slash(self, interaction: discord.Interaction, name: str, sector: Optional[str] = None):
+        ok = self.db.set_sector(name, sector)
+        if ok:
+            await interaction.response.send_message(
+                f"🏷️ **{name}** is now in sector **{sector}**." if sector else f"🏷️ **{name}** no longer has a sector.",
+                ephemeral=True,
+            )
+        else:
+            await interaction.response.send_message("❌ Company not found.", ephemeral=True)
+
     @commands.command(name="fund")
     @admin_check()
     async def fund_prefix(self, ctx: commands.Context, member: discord.Member, amount: float):
@@ -318,6 +854,7 @@ class Stocks(commands.Cog):
         if amount <= 0:
             return await ctx.reply("Amount must be positive.")
         new_bal = self.db.add_balance(member.id, amount)
+        self._invalidate_portfolio(member.id)
         await ctx.reply(f"💰 Funded {member.mention}: +{amount:.2f} (balance {new_bal:.2f})")
 
     @app_commands.command(name="fund", description="Credit a user's trading balance")
@@ -327,6 +864,7 @@ class Stocks(commands.Cog):
         if amount <= 0:
             return await interaction.response.send_message("Amount must be positive.", ephemeral=True)
         new_bal = self.db.add_balance(member.id, amount)
+        self._invalidate_portfolio(member.id)
         await interaction.response.send_message(
             f"💰 Funded {member.mention}: +{amount:.2f} (balance {new_bal:.2f})",
             ephemeral=True,
@@ -340,6 +878,7 @@ class Stocks(commands.Cog):
             return await ctx.reply("Amount must be positive.")
         try:
             new_bal = self.db.add_balance(member.id, -amount)
+            self._invalidate_portfolio(member.id)
         except ValueError:
             return await ctx.reply("❌ Insufficient funds to remove.")
         await ctx.reply(f"🧾 Removed funds from {member.mention}: -{amount:.2f} (balance {new_bal:.2f})")
@@ -352,6 +891,7 @@ class Stocks(commands.Cog):
             return await interaction.response.send_message("Amount must be positive.", ephemeral=True)
         try:
             new_bal = self.db.add_balance(member.id, -amount)
+            self._invalidate_portfolio(member.id)
         except ValueError:
             return await interaction.response.send_message("❌ Insufficient funds to remove.", ephemeral=True)
         await interaction.response.send_message(
@@ -362,27 +902,34 @@ class Stocks(commands.Cog):
     # ============================
     # User Commands
     # ============================
+    def _market_embed(self, companies) -> discord.Embed:
+        embed = discord.Embed(title="📈 Fictional Market", color=discord.Color.blurple())
+        # Index levels are stored by market_tick, so showing them is one small query
+        lines = []
+        for sector, level, change in self.db.latest_index():
+            label = "📊 **Market index**" if sector == MARKET_INDEX else f"• {sector}"
+            lines.append(f"{label}: {level:.2f} ({change * 100:+.2f}%)")
+        if lines:
+            embed.description = "\n".join(lines)
+        for _id, name, price, sector, _held in companies[:25]:
+            embed.add_field(name=name, value=f"{price:.2f} · {sector}" if sector else f"{price:.2f}", inline=True)
+        return embed
+
     @commands.command(name="stocks")
     async def stocks_prefix(self, ctx: commands.Context):
-        companies = self.db.list_companies()
+        companies = self.db.list_market()
         if not companies:
             return await ctx.reply("No companies listed yet. Admins can use !addstock.")
-        embed = discord.Embed(title="📈 Fictional Market", color=discord.Color.blurple())
-        for _id, name, price in companies:
-            embed.add_field(name=name, value=f"{price:.2f}", inline=True)
-        await ctx.reply(embed=embed)
+        await ctx.reply(embed=self._market_embed(companies))
 
     @app_commands.command(name="stocks", description="Show all companies and prices")
     async def stocks_slash(self, interaction: discord.Interaction):
-        companies = self.db.list_companies()
+        companies = self.db.list_market()
         if not companies:
             return await interaction.response.send_message(
                 "No companies listed yet. Admins can use /addstock.", ephemeral=True
             )
-        embed = discord.Embed(title="📈 Fictional Market", color=discord.Color.blurple())
-        for _id, name, price in companies:
-            embed.add_field(name=name, value=f"{price:.2f}", inline=True)
-        await interaction.response.send_message(embed=embed, ephemeral=False)
+        await interaction.response.send_message(embed=self._market_embed(companies), ephemeral=False)
 
     @commands.command(name="balance")
     async def balance_prefix(self, ctx: commands.Context, member: Optional[discord.Member] = None):
@@ -412,14 +959,15 @@ class Stocks(commands.Cog):
         except commands.UserInputError as e:
             return await self._respond(origin, str(e))
 
-        cost = round(price * shares, 2)
-        bal = self.db.get_balance(user.id)
-        if bal < cost:
+        # Price check, payment and shares in one transaction; other cluster processes
+        # may be trading for the same user at the same time
+        result = self.db.buy(user.id, cid, shares)
+        if result is None:
+            return await self._respond(origin, f"Company '{company}' does not exist.")
+        done, price, cost, bal = result
+        if not done:
             return await self._respond(origin, f"❌ Not enough funds. Need {cost:.2f}, you have {bal:.2f}.")
-        # Deduct & add shares atomically-ish (single thread event loop)
-        self.db.add_balance(user.id, -cost)
-        current = self.db.get_shares(user.id, cid)
-        self.db.set_shares(user.id, cid, current + shares)
+        self._invalidate_portfolio(user.id)
         await self._respond(origin, f"✅ Bought **{shares}** of **{name}** at {price:.2f} each (cost {cost:.2f}).")
 
     @commands.command(name="sell")
@@ -438,14 +986,37 @@ class Stocks(commands.Cog):
         except commands.UserInputError as e:
             return await self._respond(origin, str(e))
 
-        owned = self.db.get_shares(user.id, cid)
-        if owned < shares:
+        result = self.db.sell(user.id, cid, shares)
+        if result is None:
+            return await self._respond(origin, f"Company '{company}' does not exist.")
+        done, price, proceeds, owned = result
+        if not done:
             return await self._respond(origin, f"❌ You only own {owned} shares of {name}.")
-        proceeds = round(price * shares, 2)
-        self.db.set_shares(user.id, cid, owned - shares)
-        self.db.add_balance(user.id, proceeds)
+        self._invalidate_portfolio(user.id)
         await self._respond(origin, f"✅ Sold **{shares}** of **{name}** at {price:.2f} each (received {proceeds:.2f}).")
 
+    @commands.command(name="payouts")
+    async def payouts_prefix(self, ctx: commands.Context):
+        await self._payouts(ctx)
+
+    @app_commands.command(name="payouts", description="Show recent dividend and interest payouts")
+    async def payouts_slash(self, interaction: discord.Interaction):
+        await self._payouts(interaction)
+
+    async def _payouts(self, origin):
+        rows = self.db.recent_payouts()
+        if not rows:
+            return await self._respond(origin, "No payouts yet.")
+        embed = discord.Embed(title="💸 Recent Payouts", color=discord.Color.gold())
+        for ts, kind, company, rate, recipients, total in rows:
+            label = f"Dividend — {company or 'delisted'}" if kind == "dividend" else "Interest"
+            embed.add_field(
+                name=label,
+                value=f"<t:{ts}:R>: {rate * 100:g}% to {recipients} holder(s), {total:.2f} total",
+                inline=False,
+            )
+        await self._respond(origin, embed=embed)
+
     @commands.command(name="portfolio")
     async def portfolio_prefix(self, ctx: commands.Context, member: Optional[discord.Member] = None):
         target = member or ctx.author
@@ -456,16 +1027,24 @@ class Stocks(commands.Cog):
         target = member or interaction.user
         await self._portfolio(interaction, target)
 
+    def _portfolio_snapshot(self, user_id: int) -> tuple:
+        cached = self._portfolios.get(user_id)
+        if cached and cached[0] == self._tick_version:
+            self._portfolios.move_to_end(user_id)
+            return cached[1]
+        snapshot = self.db.get_portfolio_snapshot(user_id)
+        if SHARD_IDS is None:
+            self._portfolios[user_id] = (self._tick_version, snapshot)
+            if len(self._portfolios) > PORTFOLIO_CACHE_SIZE:
+                self._portfolios.popitem(last=False)
+        return snapshot
+
     async def _portfolio(self, origin, user: discord.User):
-        rows = self.db.get_portfolio(user.id)
-        bal = self.db.get_balance(user.id)
+        rows, bal, total_value = self._portfolio_snapshot(user.id)
         if not rows:
             return await self._respond(origin, f"{user.mention} has no holdings. Balance **{bal:.2f}**.")
-        total_value = 0.0
         embed = discord.Embed(title=f"💼 Portfolio — {user.display_name}", color=discord.Color.green())
-        for name, shares, price in rows:
-            line_value = round(price * shares, 2)
-            total_value += line_value
+        for name, shares, price, line_value in rows:
             embed.add_field(name=name, value=f"{shares} @ {price:.2f} = {line_value:.2f}", inline=False)
         embed.add_field(name="Balance", value=f"{bal:.2f}", inline=False)
         embed.add_field(name="Portfolio Value", value=f"{total_value:.2f}", inline=False)
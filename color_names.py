@@ -0,0 +1,163 @@
+# color_names.py
+# Color parsing for /color and the nearest named color for any value.
+#
+# Names are the CSS Color Module 4 / X11 set. Nearest-name lookups run on a
+# k-d tree built once at import, in OKLab, where straight-line distance is
+# close to how different two colors look (plain RGB distance isn't).
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+MAX_COLORS = 16                   # Colors accepted in one request
+
+# ====== NAME TABLE ======
+NAMED_COLORS: Dict[str, int] = {
+    "aliceblue": 0xF0F8FF, "antiquewhite": 0xFAEBD7, "aqua": 0x00FFFF, "aquamarine": 0x7FFFD4,
+    "azure": 0xF0FFFF, "beige": 0xF5F5DC, "bisque": 0xFFE4C4, "black": 0x000000,
+    "blanchedalmond": 0xFFEBCD, "blue": 0x0000FF, "blueviolet": 0x8A2BE2, "brown": 0xA52A2A,
+    "burlywood": 0xDEB887, "cadetblue": 0x5F9EA0, "chartreuse": 0x7FFF00, "chocolate": 0xD2691E,
+    "coral": 0xFF7F50, "cornflowerblue": 0x6495ED, "cornsilk": 0xFFF8DC, "crimson": 0xDC143C,
+    "cyan": 0x00FFFF, "darkblue": 0x00008B, "darkcyan": 0x008B8B, "darkgoldenrod": 0xB8860B,
+    "darkgray": 0xA9A9A9, "darkgreen": 0x006400, "darkgrey": 0xA9A9A9, "darkkhaki": 0xBDB76B,
+    "darkmagenta": 0x8B008B, "darkolivegreen": 0x556B2F, "darkorange": 0xFF8C00, "darkorchid": 0x9932CC,
+    "darkred": 0x8B0000, "darksalmon": 0xE9967A, "darkseagreen": 0x8FBC8F, "darkslateblue": 0x483D8B,
+    "darkslategray": 0x2F4F4F, "darkslategrey": 0x2F4F4F, "darkturquoise": 0x00CED1, "darkviolet": 0x9400D3,
+    "deeppink": 0xFF1493, "deepskyblue": 0x00BFFF, "dimgray": 0x696969, "dimgrey": 0x696969,
+    "dodgerblue": 0x1E90FF, "firebrick": 0xB22222, "floralwhite": 0xFFFAF0, "forestgreen": 0x228B22,
+    "fuchsia": 0xFF00FF, "gainsboro": 0xDCDCDC, "ghostwhite": 0xF8F8FF, "gold": 0xFFD700,
+    "goldenrod": 0xDAA520, "gray": 0x808080, "green": 0x008000, "greenyellow": 0xADFF2F,
+    "grey": 0x808080, "honeydew": 0xF0FFF0, "hotpink": 0xFF69B4, "indianred": 0xCD5C5C,
+    "indigo": 0x4B0082, "ivory": 0xFFFFF0, "khaki": 0xF0E68C, "lavender": 0xE6E6FA,
+    "lavenderblush": 0xFFF0F5, "lawngreen": 0x7CFC00, "lemonchiffon": 0xFFFACD, "lightblue": 0xADD8E6,
+    "lightcoral": 0xF08080, "lightcyan": 0xE0FFFF, "lightgoldenrodyellow": 0xFAFAD2, "lightgray": 0xD3D3D3,
+    "lightgreen": 0x90EE90, "lightgrey": 0xD3D3D3, "lightpink": 0xFFB6C1, "lightsalmon": 0xFFA07A,
+    "lightseagreen": 0x20B2AA, "lightskyblue": 0x87CEFA, "lightslategray": 0x778899, "lightslategrey": 0x778899,
+    "lightsteelblue": 0xB0C4DE, "lightyellow": 0xFFFFE0, "lime": 0x00FF00, "limegreen": 0x32CD32,
+    "linen": 0xFAF0E6, "magenta": 0xFF00FF, "maroon": 0x800000, "mediumaquamarine": 0x66CDAA,
+    "mediumblue": 0x0000CD, "mediumorchid": 0xBA55D3, "mediumpurple": 0x9370DB, "mediumseagreen": 0x3CB371,
+    "mediumslateblue": 0x7B68EE, "mediumspringgreen": 0x00FA9A, "mediumturquoise": 0x48D1CC, "mediumvioletred": 0xC71585,
+    "midnightblue": 0x191970, "mintcream": 0xF5FFFA, "mistyrose": 0xFFE4E1, "moccasin": 0xFFE4B5,
+    "navajowhite": 0xFFDEAD, "navy": 0x000080, "oldlace": 0xFDF5E6, "olive": 0x808000,
+    "olivedrab": 0x6B8E23, "orange": 0xFFA500, "orangered": 0xFF4500, "orchid": 0xDA70D6,
+    "palegoldenrod": 0xEEE8AA, "palegreen": 0x98FB98, "paleturquoise": 0xAFEEEE, "palevioletred": 0xDB7093,
+    "papayawhip": 0xFFEFD5, "peachpuff": 0xFFDAB9, "peru": 0xCD853F, "pink": 0xFFC0CB,
+    "plum": 0xDDA0DD, "powderblue": 0xB0E0E6, "purple": 0x800080, "rebeccapurple": 0x663399,
+    "red": 0xFF0000, "rosybrown": 0xBC8F8F, "royalblue": 0x4169E1, "saddlebrown": 0x8B4513,
+    "salmon": 0xFA8072, "sandybrown": 0xF4A460, "seagreen": 0x2E8B57, "seashell": 0xFFF5EE,
+    "sienna": 0xA0522D, "silver": 0xC0C0C0, "skyblue": 0x87CEEB, "slateblue": 0x6A5ACD,
+    "slategray": 0x708090, "slategrey": 0x708090, "snow": 0xFFFAFA, "springgreen": 0x00FF7F,
+    "steelblue": 0x4682B4, "tan": 0xD2B48C, "teal": 0x008080, "thistle": 0xD8BFD8,
+    "tomato": 0xFF6347, "turquoise": 0x40E0D0, "violet": 0xEE82EE, "wheat": 0xF5DEB3,
+    "white": 0xFFFFFF, "whitesmoke": 0xF5F5F5, "yellow": 0xFFFF00, "yellowgreen": 0x9ACD32,
+    # Discord's own palette, so role colors picked in the client get a familiar name
+    "blurple": 0x5865F2, "discordgreen": 0x57F287, "discordyellow": 0xFEE75C,
+    "discordfuchsia": 0xEB459E, "discordred": 0xED4245,
+}
+
+# ====== PARSING ======
+_HEX_RE = re.compile(r"#?([0-9a-fA-F]{3}|[0-9a-fA-F]{6})")
+_SEPARATORS = re.compile(r"[,;]+")  # Not spaces: names like "light gray" contain them
+
+
+def parse_color(text: str) -> Optional[int]:
+    """`#FF5733`, `FF5733`, `#F53`, `F53` or a color name (case, spaces, - and _ ignored) -> 0xRRGGBB."""
+    text = text.strip()
+    name = re.sub(r"[\s_-]", "", text).lower()
+    if name in NAMED_COLORS:
+        return NAMED_COLORS[name]
+    match = _HEX_RE.fullmatch(text)
+    if not match:
+        return None
+    digits = match.group(1)
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    return int(digits, 16)
+
+
+def parse_colors(text: str) -> Tuple[List[int], List[str]]:
+    """Split a list on commas or semicolons. Returns (colors, parts that aren't colors)."""
+    colors, invalid = [], []
+    for part in _SEPARATORS.split(text.strip()):
+        if not part:
+            continue
+        value = parse_color(part)
+        if value is None:
+            invalid.append(part)
+        else:
+            colors.append(value)
+    return colors, invalid
+
+
+# ====== OKLAB ======
+def _linear(channel: int) -> float:
+    c = channel / 255
+    return c / 12.92 if c <= 0.04045 else ((c + 0.055) / 1.055) ** 2.4
+
+
+def to_oklab(color: int) -> Tuple[float, float, float]:
+    r, g, b = (_linear((color >> shift) & 0xFF) for shift in (16, 8, 0))
+    l = (0.4122214708 * r + 0.5363325363 * g + 0.0514459929 * b) ** (1 / 3)
+    m = (0.2119034982 * r + 0.6806995451 * g + 0.1073969566 * b) ** (1 / 3)
+    s = (0.0883024619 * r + 0.2817188376 * g + 0.6299787005 * b) ** (1 / 3)
+    return (
+        0.2104542553 * l + 0.7936177850 * m - 0.0040720468 * s,
+        1.9779984951 * l - 2.4285922050 * m + 0.4505937099 * s,
+        0.0259040371 * l + 0.7827717662 * m - 0.8086757660 * s,
+    )
+
+
+# ====== NEAREST NAME ======
+class _KDTree:
+    """Static 3-d tree over (point, name) pairs; nodes are (point, name, axis, left, right) tuples."""
+
+    def __init__(self, entries: List[Tuple[Tuple[float, float, float], str]]):
+        self.root = self._build(entries, 0)
+
+    def _build(self, entries, depth):
+        if not entries:
+            return None
+        axis = depth % 3
+        entries = sorted(entries, key=lambda e: e[0][axis])
+        mid = len(entries) // 2
+        point, name = entries[mid]
+        return point, name, axis, self._build(entries[:mid], depth + 1), self._build(entries[mid + 1:], depth + 1)
+
+    def nearest(self, target: Tuple[float, float, float]) -> Tuple[str, float]:
+        best = [None, math.inf]  # name, squared distance
+
+        def visit(node):
+            if node is None:
+                return
+            point, name, axis, left, right = node
+            dist = sum((p - t) ** 2 for p, t in zip(point, target))
+            if dist < best[1]:
+                best[0], best[1] = name, dist
+            diff = target[axis] - point[axis]
+            near, far = (left, right) if diff < 0 else (right, left)
+            visit(near)
+            if diff * diff < best[1]:
+                visit(far)
+
+        visit(self.root)
+        return best[0], math.sqrt(best[1])
+
+
+# Duplicate values (gray/grey, aqua/cyan...) keep the first name in the table
+_unique: Dict[int, str] = {}
+for _name, _value in NAMED_COLORS.items():
+    _unique.setdefault(_value, _name)
+_TREE = _KDTree([(to_oklab(value), name) for value, name in _unique.items()])
+
+
+def nearest_color(color: int) -> Tuple[str, int, float]:
+    """(name, value, distance) of the closest named color. Distance is OKLab ΔE ×100, 0 is exact."""
+    name, distance = _TREE.nearest(to_oklab(color))
+    return name, NAMED_COLORS[name], distance * 100
+
+
+def describe_color(value: int) -> str:
+    """Markdown label for a color, e.g. `#FF5733` — nearest named color **tomato** (`#FF6347`, ΔE 1.9)."""
+    name, named_value, distance = nearest_color(value)
+    if distance < 0.5:
+        return f"`#{value:06X}` — **{name}**"
+    return f"`#{value:06X}` — nearest named color **{name}** (`#{named_value:06X}`, ΔE {distance:.1f})"
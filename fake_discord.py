@@ -0,0 +1,211 @@
+# fake_discord.py
+# Offline stand-ins for discord.Guild / Role / CategoryChannel used to measure
+# the structure import path without touching a real server. Only the surface
+# structure.apply_structure() needs is implemented.
+#
+# Requests go through FakeHTTP, which emulates Discord's fixed-window rate
+# limit buckets (one per route and guild, plus the global bucket), answers
+# with a 429 + retry_after when a bucket is empty and then retries after
+# waiting, the same way discord.py's HTTP client does. Every request also gets
+# a random latency. All durations are multiplied by ``time_scale`` so big
+# benchmarks finish quickly.
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+# ====== EMULATED LIMITS ======
+# (requests, window seconds). Discord doesn't publish exact per-route numbers;
+# these are in the range observed for guild-scoped create/edit routes.
+ROUTE_LIMITS: Dict[str, Tuple[int, float]] = {
+    "create_role": (10, 10.0),
+    "create_channel": (10, 10.0),
+    "edit_role_positions": (5, 5.0),
+    "bulk_channel_update": (5, 5.0),
+    "send_message": (5, 5.0),
+}
+GLOBAL_LIMIT: Tuple[int, float] = (50, 1.0)
+LATENCY_RANGE: Tuple[float, float] = (0.05, 0.15)
+
+_ids = itertools.count(1 << 40)
+
+
+class _Bucket:
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def take(self, now: float) -> Optional[float]:
+        """Use one request; returns retry_after in seconds when the bucket is empty."""
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.window
+        if self.remaining <= 0:
+            return self.reset_at - now
+        self.remaining -= 1
+        return None
+
+
+class FakeHTTP:
+    """Emulated Discord REST endpoint. Counts every attempt and every 429."""
+
+    def __init__(self, time_scale: float = 1.0, seed: Optional[int] = None):
+        self.time_scale = time_scale
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+        self._global = _Bucket(GLOBAL_LIMIT[0], GLOBAL_LIMIT[1] * time_scale)
+        self._buckets: Dict[Tuple[str, int], _Bucket] = {}
+
+    def _bucket(self, route: str, major_id: int) -> _Bucket:
+        key = (route, major_id)
+        if key not in self._buckets:
+            limit, window = ROUTE_LIMITS[route]
+            self._buckets[key] = _Bucket(limit, window * self.time_scale)
+        return self._buckets[key]
+
+    async def request(self, route: str, major_id: int):
+        while True:
+            await asyncio.sleep(self.random.uniform(*LATENCY_RANGE) * self.time_scale)
+            self.calls += 1
+            now = time.monotonic()
+            retry_after = self._global.take(now)
+            if retry_after is None:
+                retry_after = self._bucket(route, major_id).take(now)
+            if retry_after is None:
+                return
+            # 429: discord.py sleeps for retry_after and retries the same request
+            self.rate_limited += 1
+            await asyncio.sleep(retry_after)
+
+
+# ====== MODELS ======
+class FakeRole:
+    def __init__(self, guild: "FakeGuild", name: str, position: int, permissions=None, color=None):
+        self.guild = guild
+        self.id = next(_ids)
+        self.name = name
+        self.position = position
+        self.permissions = permissions or discord.Permissions.none()
+        self.color = color or discord.Color.default()
+        self.managed = False
+
+    def is_default(self) -> bool:
+        return self.id == self.guild.id
+
+    def __lt__(self, other: "FakeRole") -> bool:
+        return (self.position, self.id) < (other.position, other.id)
+
+    def __repr__(self):
+        return f"<FakeRole {self.name!r} position={self.position}>"
+
+
+class FakeChannel:
+    def __init__(self, guild: "FakeGuild", name: str, kind: str, category=None, position: int = 0, overwrites=None, topic=None):
+        self.guild = guild
+        self.id = next(_ids)
+        self.name = name
+        self.type = kind
+        self.category = category
+        self.position = position
+        self.overwrites = dict(overwrites or {})
+        self.topic = topic
+        self.channels: List["FakeChannel"] = []
+
+    async def send(self, content=None, **kwargs):
+        await self.guild.http.request("send_message", self.id)
+
+    def __repr__(self):
+        return f"<FakeChannel {self.name!r} {self.type} position={self.position}>"
+
+
+class _FakeMember:
+    def __init__(self, top_role: FakeRole):
+        self.top_role = top_role
+
+
+class _GuildHTTP:
+    """The slice of discord.py's HTTPClient that apply_structure calls directly."""
+
+    def __init__(self, guild: "FakeGuild"):
+        self.guild = guild
+
+    async def bulk_channel_update(self, guild_id: int, data, *, reason=None):
+        await self.guild.http.request("bulk_channel_update", guild_id)
+        for entry in data:
+            self.guild.channels_by_id[entry["id"]].position = entry["position"]
+
+
+class _FakeState:
+    def __init__(self, guild: "FakeGuild"):
+        self.http = _GuildHTTP(guild)
+
+
+class FakeGuild:
+    """A guild with just @everyone and the bot's own role, backed by FakeHTTP."""
+
+    def __init__(self, http: FakeHTTP, name: str = "Benchmark"):
+        self.http = http
+        self.id = next(_ids)
+        self.name = name
+        self._state = _FakeState(self)
+        self.default_role = FakeRole(self, "@everyone", 0)
+        self.default_role.id = self.id
+        bot_role = FakeRole(self, "Utilitation", 1)
+        bot_role.managed = True
+        self.roles: List[FakeRole] = [self.default_role, bot_role]
+        self.me = _FakeMember(bot_role)
+        self.channels_by_id: Dict[int, FakeChannel] = {}
+        self.report_channel = FakeChannel(self, "bot-commands", "text")
+
+    @property
+    def categories(self) -> List[FakeChannel]:
+        return [c for c in self.channels_by_id.values() if c.type == "category"]
+
+    def get_channel(self, channel_id: int) -> Optional[FakeChannel]:
+        return self.channels_by_id.get(channel_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return discord.utils.get(self.roles, id=role_id)
+
+    async def create_role(self, *, name: str, permissions=None, color=None, **kwargs) -> FakeRole:
+        await self.http.request("create_role", self.id)
+        # New roles land just above @everyone, like on Discord
+        for role in self.roles:
+            if not role.is_default():
+                role.position += 1
+        role = FakeRole(self, name, 1, permissions, color)
+        self.roles.append(role)
+        return role
+
+    async def edit_role_positions(self, positions, *, reason=None):
+        await self.http.request("edit_role_positions", self.id)
+        for role, position in positions.items():
+            role.position = position
+        return self.roles
+
+    async def _create_channel(self, name: str, kind: str, category=None, overwrites=None, topic=None) -> FakeChannel:
+        await self.http.request("create_channel", self.id)
+        siblings = category.channels if category else self.categories
+        channel = FakeChannel(
+            self, name, kind, category, len(siblings),
+            overwrites if overwrites is not None else getattr(category, "overwrites", None), topic,
+        )
+        self.channels_by_id[channel.id] = channel
+        if category:
+            category.channels.append(channel)
+        return channel
+
+    async def create_category(self, name: str, *, overwrites=None, **kwargs) -> FakeChannel:
+        return await self._create_channel(name, "category", overwrites=overwrites)
+
+    async def create_text_channel(self, name: str, *, category=None, overwrites=None, topic=None, **kwargs) -> FakeChannel:
+        return await self._create_channel(name, "text", category, overwrites, topic)
+
+    async def create_voice_channel(self, name: str, *, category=None, overwrites=None, **kwargs) -> FakeChannel:
+        return await self._create_channel(name, "voice", category, overwrites)
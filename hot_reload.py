@@ -0,0 +1,93 @@
+# hot_reload.py
+# Development/ops mode that reloads cogs when their files change, without
+# restarting the bot or touching the gateway connection. Uses mtime polling
+# so it works everywhere without extra packages.
+#
+# Enable with UTILITATION_WATCH=1.
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from discord.ext import commands
+
+WATCH_COGS = os.environ.get("UTILITATION_WATCH") == "1"
+WATCH_INTERVAL = 1.0              # Seconds between mtime scans
+
+log = logging.getLogger(__name__)
+
+
+class CogWatcher:
+    """Polls a cogs directory and loads, reloads or unloads extensions that changed.
+
+    ``after_change`` runs once after each batch of changes, e.g. to re-sync
+    slash commands if their signatures changed.
+    """
+
+    def __init__(self, bot: commands.Bot, directory: str = "./cogs", package: str = "cogs",
+                 interval: float = WATCH_INTERVAL, after_change: Optional[Callable[[], Awaitable[None]]] = None):
+        self.bot = bot
+        self.directory = directory
+        self.package = package
+        self.interval = interval
+        self.after_change = after_change
+        self._mtimes: Dict[str, float] = self._scan()
+        self._task: Optional[asyncio.Task] = None
+
+    def _scan(self) -> Dict[str, float]:
+        mtimes = {}
+        for filename in os.listdir(self.directory):
+            if filename.endswith(".py"):
+                try:
+                    mtimes[filename] = os.stat(os.path.join(self.directory, filename)).st_mtime
+                except OSError:
+                    pass  # Deleted between listdir and stat; picked up next scan
+        return mtimes
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="cog-watcher")
+            log.info("👀 Watching %s for changes.", self.directory)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            current = self._scan()
+            changed = False
+            for filename in sorted(current.keys() | self._mtimes.keys()):
+                before, after = self._mtimes.get(filename), current.get(filename)
+                if before == after:
+                    continue
+                changed |= await self._apply(filename, before is None, after is None)
+            self._mtimes = current
+            if changed and self.after_change is not None:
+                try:
+                    await self.after_change()
+                except Exception:
+                    log.exception("❌ Post-reload hook failed")
+
+    async def _apply(self, filename: str, added: bool, removed: bool) -> bool:
+        name = f"{self.package}.{filename[:-3]}"
+        started = time.perf_counter()
+        try:
+            if removed:
+                await self.bot.unload_extension(name)
+                action = "Unloaded"
+            elif added or name not in self.bot.extensions:
+                await self.bot.load_extension(name)
+                action = "Loaded"
+            else:
+                # discord.py rolls back to the old module if the new one fails to load
+                await self.bot.reload_extension(name)
+                action = "Reloaded"
+        except Exception:
+            log.exception("❌ Hot reload of %s failed", filename)
+            return False
+        log.info("♻️ %s cog: %s (%.0f ms)", action, filename, (time.perf_counter() - started) * 1000)
+        return True
@@ -0,0 +1,141 @@
+# intake_server.py
+# Optional web server that serves the generator page (index.html) and takes
+# the finished template straight from the browser, so it doesn't have to be
+# uploaded to a file host first.
+#
+# A POSTed template is validated and answered with a one-time token; an admin
+# then runs `!redeem <token>` in their server. Bodies are read in chunks and
+# cut off at MAX_TEMPLATE_BYTES.
+#
+# Enable with UTILITATION_INTAKE=1. Under cluster.py the server runs in the
+# primary process only (one port); pending uploads are kept in SQLite so the
+# token can be redeemed from whichever process runs the admin's guild.
+import json
+import logging
+import os
+import secrets
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+from structure import StructureError, compile_structure
+
+INTAKE_ENABLED = os.environ.get("UTILITATION_INTAKE") == "1"
+INTAKE_HOST = os.environ.get("UTILITATION_INTAKE_HOST", "127.0.0.1")
+INTAKE_PORT = int(os.environ.get("UTILITATION_INTAKE_PORT", "8080"))
+PAGE_PATH = "index.html"
+MAX_TEMPLATE_BYTES = 1024 * 1024  # Larger uploads are rejected with 413
+READ_CHUNK_SIZE = 64 * 1024
+TOKEN_TTL = 15 * 60               # Seconds a token stays redeemable
+MAX_PENDING = 100                 # Unredeemed uploads held at once
+UPLOAD_DB_PATH = "data/uploads.sqlite3"
+
+log = logging.getLogger(__name__)
+
+
+class PendingUploads:
+    """Validated uploads waiting for `!redeem`, shared by every process of a cluster."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def _init_db(self):
+        with self._connect() as con:
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS pending_uploads (
+                    token TEXT PRIMARY KEY,
+                    expires_at REAL NOT NULL,
+                    template TEXT NOT NULL
+                );
+                """
+            )
+            con.commit()
+
+    def add(self, data: Dict[str, Any], ttl: float, max_pending: int) -> Optional[str]:
+        """Stores a compiled template and returns its token, or None if too many are waiting."""
+        token = secrets.token_urlsafe(12)
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("DELETE FROM pending_uploads WHERE expires_at < ?", (time.time(),))
+            cur.execute("SELECT COUNT(*) FROM pending_uploads")
+            if cur.fetchone()[0] >= max_pending:
+                return None
+            cur.execute(
+                "INSERT INTO pending_uploads (token, expires_at, template) VALUES (?, ?, ?)",
+                (token, time.time() + ttl, json.dumps(data)),
+            )
+            return token
+
+    def redeem(self, token: str) -> Optional[Dict[str, Any]]:
+        """The compiled template for a token, once. None if unknown or expired."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            cur.execute("SELECT expires_at, template FROM pending_uploads WHERE token = ?", (token,))
+            row = cur.fetchone()
+            if not row:
+                return None
+            cur.execute("DELETE FROM pending_uploads WHERE token = ?", (token,))
+            return json.loads(row[1]) if row[0] >= time.time() else None
+
+
+class TemplateIntake:
+    def __init__(self, host: str = INTAKE_HOST, port: int = INTAKE_PORT, db_path: str = UPLOAD_DB_PATH):
+        self.host = host
+        self.port = port
+        self.uploads = PendingUploads(db_path)
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/", self._page)
+        app.router.add_post("/template", self._receive)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info("🌐 Template intake listening on http://%s:%d/", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def redeem(self, token: str) -> Optional[Dict[str, Any]]:
+        return self.uploads.redeem(token)
+
+    async def _page(self, request: web.Request) -> web.StreamResponse:
+        return web.FileResponse(PAGE_PATH)
+
+    async def _receive(self, request: web.Request) -> web.Response:
+        if request.content_length is not None and request.content_length > MAX_TEMPLATE_BYTES:
+            return _error(413, f"Template is larger than {MAX_TEMPLATE_BYTES // 1024} KiB.")
+        body = bytearray()
+        async for chunk in request.content.iter_chunked(READ_CHUNK_SIZE):
+            body += chunk
+            if len(body) > MAX_TEMPLATE_BYTES:
+                return _error(413, f"Template is larger than {MAX_TEMPLATE_BYTES // 1024} KiB.")
+
+        try:
+            data = compile_structure(json.loads(body))
+        except ValueError:
+            return _error(400, "Body is not valid JSON.")
+        except StructureError as e:
+            return web.json_response({"error": "Template has problems.", "problems": e.errors}, status=400)
+
+        token = self.uploads.add(data, TOKEN_TTL, MAX_PENDING)
+        if token is None:
+            return _error(503, "Too many uploads waiting to be redeemed, try again later.")
+        log.info("📨 Template received (%d bytes), waiting for redemption", len(body))
+        return web.json_response({"token": token, "expires_in": TOKEN_TTL})
+
+
+def _error(status: int, message: str) -> web.Response:
+    return web.json_response({"error": message}, status=status)
@@ -1,120 +1,357 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 import aiohttp
 import asyncio
-import threading
+import hashlib
+import io
+import json
+import logging
 import os
+import time
+
+from bot_logging import setup_logging
+from client_config import client_options, event_meter
+from cluster import CLUSTER_ID, IS_PRIMARY_CLUSTER, SHARD_COUNT, SHARD_IDS, owns_guild
+from color_names import describe_color
+from hot_reload import WATCH_COGS, CogWatcher
+from intake_server import INTAKE_ENABLED, TemplateIntake
+from puppet_relay import PuppetRelay
+from runner import MultiClientRunner
+from stall_watchdog import StallWatchdog
+from swatch import render_palette
+
+from structure import (
+    JOURNAL_DB_PATH,
+    ROLLOUT_RATE,
+    TEMPLATE_DB_PATH,
+    ImportJournal,
+    StructureError,
+    TemplateStore,
+    apply_structure,
+    compile_structure,
+    diff_structures,
+    export_file,
+    format_errors,
+    missing_overwrite_targets,
+    rollout_structure,
+)
 
 # ====== TOKENS ======
 MAIN_BOT_TOKEN = "No"
 PUPPET_BOT_TOKEN = "nuh,uh"
 
-# ====== MAIN BOT SETUP ======
-main_intents = discord.Intents.default()
-main_intents.guilds = True
-main_intents.guild_messages = True
-main_intents.message_content = True
+# ====== STARTUP ======
+COMMAND_HASH_PATH = "data/command_tree.sha256"  # Hash of the last synced slash command tree
+FORCE_SYNC = os.environ.get("UTILITATION_FORCE_SYNC") == "1"
+
+log = logging.getLogger("utilitation")
 
-main_bot = commands.Bot(command_prefix="!", intents=main_intents)
+# ====== MAIN BOT SETUP ======
+# Runs every shard itself, or the slice cluster.py assigned to this process
+main_bot = commands.AutoShardedBot(
+    command_prefix="!", shard_count=SHARD_COUNT, shard_ids=SHARD_IDS, **client_options("main")
+)
+event_meter.watch("main", main_bot)
 
 @main_bot.event
 async def on_ready():
-    print(f"✅ Main Bot Logged in as {main_bot.user}")
+    log.info("✅ Main Bot Logged in as %s", main_bot.user)
+
+async def load_cog(filename: str):
+    started = time.perf_counter()
+    try:
+        await main_bot.load_extension(f"cogs.{filename[:-3]}")
+        log.info("✅ Loaded cog: %s (%.0f ms)", filename, (time.perf_counter() - started) * 1000)
+    except Exception:
+        log.exception("❌ Failed to load cog %s", filename)
+
+def command_tree_hash(tree: app_commands.CommandTree) -> str:
+    """Stable hash of the global slash command payload Discord would receive on sync."""
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands()), key=lambda c: (c.get("type", 1), c["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+async def sync_commands_if_changed():
+    # Global sync is heavily rate limited; only do it when the commands changed
+    tree_hash = command_tree_hash(main_bot.tree)
+    try:
+        with open(COMMAND_HASH_PATH) as f:
+            synced_hash = f.read().strip()
+    except OSError:
+        synced_hash = None
+    if tree_hash == synced_hash and not FORCE_SYNC:
+        log.info("🔁 Slash commands unchanged, skipping sync.")
+        return
+
+    try:
+        synced = await main_bot.tree.sync()
+        log.info("🔁 Synced %d global slash commands.", len(synced))
+        with open(COMMAND_HASH_PATH, "w") as f:
+            f.write(tree_hash)
+    except Exception:
+        log.exception("❌ Slash command sync failed")
 
 # Load all cogs from cogs folder
 @main_bot.event
 async def setup_hook():
-    for filename in os.listdir("./cogs"):
-        if filename.endswith(".py"):
-            try:
-                await main_bot.load_extension(f"cogs.{filename[:-3]}")
-                print(f"✅ Loaded cog: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to load cog {filename}: {e}")
+    # Cogs don't depend on each other, so their async setup can overlap
+    await asyncio.gather(*(load_cog(f) for f in sorted(os.listdir("./cogs")) if f.endswith(".py")))
+    # Commands are global, so one process of a cluster syncs for all
+    if IS_PRIMARY_CLUSTER:
+        await sync_commands_if_changed()
 
-    try:
-        synced = await main_bot.tree.sync()
-        print(f"🔁 Synced {len(synced)} global slash commands.")
-    except Exception as e:
-        print(f"❌ Slash command sync failed: {e}")
+    if WATCH_COGS:
+        # Every process reloads its own cogs; only the primary re-syncs commands
+        CogWatcher(main_bot, after_change=sync_commands_if_changed if IS_PRIMARY_CLUSTER else None).start()
 
 # ====== STRUCTURE IMPORT COMMAND ======
-@main_bot.command()
-@commands.has_permissions(administrator=True)
-async def importjson(ctx, url: str):
+import_journal = ImportJournal(JOURNAL_DB_PATH)
+
+async def fetch_structure(ctx, url: str):
+    """Download and validate a structure file, replying with any problems. Returns None on failure."""
     await ctx.send("📥 Downloading structure file...")
 
     try:
         async with aiohttp.ClientSession() as session:
             async with session.get(url) as resp:
                 if resp.status != 200:
-                    return await ctx.send("❌ Failed to fetch the file.")
+                    await ctx.send("❌ Failed to fetch the file.")
+                    return None
                 data = await resp.json()
     except Exception as e:
-        return await ctx.send(f"❌ Error loading file: `{e}`")
+        await ctx.send(f"❌ Error loading file: `{e}`")
+        return None
+
+    # Validate everything up front so a bad entry can't strand a half-built server
+    try:
+        return compile_structure(data)
+    except StructureError as e:
+        await ctx.send(format_errors(e.errors))
+        return None
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def importjson(ctx, url: str, job_id: str = None):
+    """Import a structure file. Use `!importjson resume <job>` to continue an interrupted import."""
+    if url == "resume":
+        if not job_id:
+            return await ctx.send("❌ Usage: `!importjson resume <job>`")
+        job = import_journal.get_job(job_id)
+        if not job or job[0] != ctx.guild.id:
+            return await ctx.send(f"❌ No import job `{job_id}` for this server.")
+        _guild_id, data, status = job
+        if status == "done":
+            return await ctx.send(f"✅ Import job `{job_id}` already finished.")
+        await ctx.send(f"⏯️ Resuming import job `{job_id}`...")
+        await run_import(ctx, data, job_id)
+    else:
+        data = await fetch_structure(ctx, url)
+        if data is not None:
+            await run_import(ctx, data)
+
+async def run_import(ctx, data, job_id: str = None):
+    """Apply a compiled structure to ctx.guild, opening a new journal job unless resuming one."""
+    if job_id is None:
+        missing = missing_overwrite_targets(ctx.guild, data)
+        if missing:
+            return await ctx.send(format_errors(missing))
+        job_id = import_journal.create_job(ctx.guild.id, data)
+        await ctx.send(f"🧾 Import job `{job_id}` started. If it gets interrupted, run `!importjson resume {job_id}`.")
+
+    if await apply_structure(ctx.guild, data, ctx.send, import_journal, job_id):
+        await ctx.send(f"🏁 Import job `{job_id}` finished.")
+    else:
+        await ctx.send(f"⚠️ Import job `{job_id}` finished with errors. Fix them and run `!importjson resume {job_id}`.")
+
+# ====== TEMPLATE LIBRARY COMMANDS ======
+TEMPLATE_PALETTE_ROLES = 50       # Roles shown by !templatecolors
+
+template_store = TemplateStore(TEMPLATE_DB_PATH)
+
+def _split_template_ref(ref: str):
+    """`name` or `name@version` -> (name, version or None)."""
+    name, _, version = ref.partition("@")
+    return name, int(version) if version.isdigit() else None
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def savetemplate(ctx, name: str, url: str):
+    """Validate a structure file once and keep it under a name: !savetemplate <name> <url>"""
+    data = await fetch_structure(ctx, url)
+    if data is None:
+        return
+    version, digest, is_new = template_store.save(ctx.guild.id, name, data)
+    if is_new:
+        await ctx.send(f"💾 Saved template `{name}` version {version} (`{digest[:12]}`).")
+    else:
+        await ctx.send(f"💾 Template `{name}` version {version} already has this exact content, nothing changed.")
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def importtemplate(ctx, ref: str):
+    """Import a saved template without downloading or re-validating it: !importtemplate <name>[@version]"""
+    name, version = _split_template_ref(ref)
+    found = template_store.load(ctx.guild.id, name, version)
+    if not found:
+        return await ctx.send(f"❌ No saved template `{ref}`. See `!templates`.")
+    version, data = found
+    await ctx.send(f"📦 Importing template `{name}` version {version}...")
+    await run_import(ctx, data)
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def templates(ctx):
+    """List the templates saved for this server."""
+    rows = template_store.list_templates(ctx.guild.id)
+    if not rows:
+        return await ctx.send("No saved templates yet. Use `!savetemplate <name> <url>`.")
+    lines = ["📚 Saved templates:"]
+    lines += [f"• `{name}` v{version} (`{digest[:12]}`)" for name, version, digest in rows]
+    await send_lines(ctx, lines)
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def templatediff(ctx, old_ref: str, new_ref: str):
+    """Compare two saved templates: !templatediff <name>[@version] <name>[@version]"""
+    loaded = []
+    for ref in (old_ref, new_ref):
+        found = template_store.load(ctx.guild.id, *_split_template_ref(ref))
+        if not found:
+            return await ctx.send(f"❌ No saved template `{ref}`.")
+        loaded.append(found[1])
+    lines = diff_structures(*loaded)
+    if not lines:
+        return await ctx.send(f"🟰 `{old_ref}` and `{new_ref}` are identical.")
+    await send_lines(ctx, [f"🔀 `{old_ref}` → `{new_ref}`:"] + lines)
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def templatecolors(ctx, ref: str):
+    """Preview every role color of a saved template as one palette: !templatecolors <name>[@version]"""
+    found = template_store.load(ctx.guild.id, *_split_template_ref(ref))
+    if not found:
+        return await ctx.send(f"❌ No saved template `{ref}`. See `!templates`.")
+    roles = found[1]["roles"][:TEMPLATE_PALETTE_ROLES]
+    if not roles:
+        return await ctx.send(f"`{ref}` has no roles.")
+    png = render_palette(tuple(role["color"] for role in roles))
+    await ctx.send(f"🎨 Role colors of `{ref}`, top to bottom:", file=discord.File(io.BytesIO(png), filename="palette.png"))
+    await send_lines(ctx, [f"• {role['name']}: {describe_color(role['color'])}" for role in roles])
+
+# ====== BROWSER UPLOADS ======
+# The generator page served by intake_server.py posts templates here directly
+template_intake = TemplateIntake()
+
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def redeem(ctx, token: str, name: str = None):
+    """Import a template sent from the generator page: !redeem <token>, or save it: !redeem <token> <name>"""
+    data = template_intake.redeem(token)
+    if data is None:
+        return await ctx.send("❌ Unknown or expired upload token. Send the template from the generator page again.")
+    if name:
+        version, digest, _is_new = template_store.save(ctx.guild.id, name, data)
+        return await ctx.send(f"💾 Saved template `{name}` version {version} (`{digest[:12]}`).")
+    await ctx.send("📦 Importing uploaded template...")
+    await run_import(ctx, data)
 
-    guild = ctx.guild
+# ====== MULTI-GUILD ROLLOUT COMMAND ======
+async def send_lines(ctx, lines):
+    """Send lines in as few messages as Discord's 2000 character limit allows."""
+    chunk = ""
+    for line in lines:
+        if chunk and len(chunk) + len(line) + 1 > 2000:
+            await ctx.send(chunk)
+            chunk = ""
+        # 1999 leaves room for the newline, so a lone long line still fits
+        chunk += line[:1999] + "\n"
+    if chunk:
+        await ctx.send(chunk)
 
-    # === Roles ===
-    for role_info in data.get("roles", []):
-        name = role_info.get("name")
-        color = int(role_info.get("color", "0xffffff").replace("#", "0x"), 16)
-        permissions_list = role_info.get("permissions", [])
+@main_bot.command()
+@commands.is_owner()
+async def rollout(ctx, url: str, *guild_ids: int):
+    """Apply one structure file to several servers at once: !rollout <url> <guild_id> <guild_id> ..."""
+    if not guild_ids:
+        return await ctx.send("❌ Usage: `!rollout <url> <guild_id> [guild_id ...]`")
+    guilds = []
+    for guild_id in guild_ids:
+        guild = main_bot.get_guild(guild_id)
+        if guild is None and not owns_guild(guild_id):
+            return await ctx.send(f"❌ Server `{guild_id}` is on another cluster process; run the rollout there.")
+        if guild is None:
+            return await ctx.send(f"❌ I'm not in a server with ID `{guild_id}`.")
+        guilds.append(guild)
 
-        perms = discord.Permissions.none()
-        for p in permissions_list:
-            if hasattr(perms, p):
-                setattr(perms, p, True)
+    data = await fetch_structure(ctx, url)
+    if data is None:
+        return
+    await ctx.send(f"🚚 Rolling out to {len(guilds)} server(s) at up to {ROLLOUT_RATE} requests/second...")
 
-        if discord.utils.get(guild.roles, name=name):
-            await ctx.send(f"⚠️ Role `{name}` already exists, skipping.")
+    results = await rollout_structure(guilds, data, import_journal)
+    lines = ["📋 Rollout report:"]
+    for guild, job_id, complete, problems in results:
+        if complete:
+            lines.append(f"✅ {guild.name} (`{guild.id}`) — job `{job_id}` done")
             continue
+        resume = f", resume there with `!importjson resume {job_id}`" if job_id else ""
+        lines.append(f"⚠️ {guild.name} (`{guild.id}`) — {len(problems)} problem(s){resume}")
+        lines.extend(f"    {p}" for p in problems[:5])
+    await send_lines(ctx, lines)
 
-        try:
-            await guild.create_role(name=name, color=discord.Color(color), permissions=perms)
-            await asyncio.sleep(1)
-            await ctx.send(f"✅ Created role: `{name}`")
-        except Exception as e:
-            await ctx.send(f"❌ Failed to create role `{name}`: {e}")
-
-    # === Categories and Channels ===
-    for cat_info in data.get("categories", []):
-        cat_name = cat_info.get("name")
-        category = discord.utils.get(guild.categories, name=cat_name)
-        if not category:
-            category = await guild.create_category(name=cat_name)
-            await ctx.send(f"📁 Created category: `{cat_name}`")
-            await asyncio.sleep(1)
-
-        for channel_info in cat_info.get("channels", []):
-            chan_name = channel_info.get("name")
-            chan_type = channel_info.get("type", "text")
-            existing = discord.utils.get(category.channels, name=chan_name)
-            if existing:
-                await ctx.send(f"⚠️ Channel `{chan_name}` already exists, skipping.")
-                continue
-
-            try:
-                if chan_type == "text":
-                    await guild.create_text_channel(name=chan_name, category=category)
-                elif chan_type == "voice":
-                    await guild.create_voice_channel(name=chan_name, category=category)
-                await ctx.send(f"📨 Created channel: `{chan_name}`")
-                await asyncio.sleep(1)
-            except Exception as e:
-                await ctx.send(f"❌ Error creating channel `{chan_name}`: {e}")
+# ====== STRUCTURE EXPORT COMMAND ======
+def _export_message(skipped: int) -> str:
+    message = "📤 Exported server structure. Upload it to filegarden and use `!importjson` to clone it."
+    if skipped:
+        message += f"\n⚠️ Skipped {skipped} object(s) the template format can't represent."
+    return message
 
-# ====== PUPPET BOT SETUP ======
-puppet_intents = discord.Intents.default()
-puppet_intents.message_content = True
-puppet_intents.guilds = True
-puppet_intents.messages = True
+@main_bot.command()
+@commands.has_permissions(administrator=True)
+async def exportjson(ctx, overwrites: bool = False):
+    """Export this server's roles, categories and channels. Use `!exportjson true` to include overwrites."""
+    file, skipped = export_file(ctx.guild, overwrites)
+    await ctx.send(_export_message(skipped), file=file)
+
+@main_bot.tree.command(name="exportjson", description="Export this server's structure as a template file")
+@app_commands.guild_only()
+@app_commands.default_permissions(administrator=True)
+@app_commands.checks.has_permissions(administrator=True)
+async def exportjson_slash(interaction: discord.Interaction, include_overwrites: bool = False):
+    file, skipped = export_file(interaction.guild, include_overwrites)
+    await interaction.response.send_message(_export_message(skipped), file=file, ephemeral=True)
 
-puppet_bot = discord.Client(intents=puppet_intents)
+# ====== DIAGNOSTICS ======
+stall_watchdog = StallWatchdog()
+
+@main_bot.command()
+@commands.is_owner()
+async def stalls(ctx, detail: int = None):
+    """Recent event loop stalls. `!stalls <n>` shows the sampled stack of stall n."""
+    history = list(stall_watchdog.history)[::-1]
+    if not history:
+        return await ctx.send(f"✅ No stalls over {stall_watchdog.threshold:.2f}s recorded. Current lag {stall_watchdog.last_lag * 1000:.0f} ms.")
+    if detail is not None:
+        if not 1 <= detail <= len(history):
+            return await ctx.send(f"❌ Pick a stall between 1 and {len(history)}.")
+        stack = "".join(history[detail - 1]["stack"])[-1900:]
+        return await ctx.send(f"```\n{stack}\n```")
+    lines = [f"🐢 {len(history)} recent stall(s), newest first (current lag {stall_watchdog.last_lag * 1000:.0f} ms):"]
+    for i, stall in enumerate(history, 1):
+        lines.append(
+            f"{i}. <t:{int(stall['started'])}:T> **{stall['duration']:.2f}s** in `{stall['where']}` "
+            f"— task `{stall['task']}`, command `{stall['command'] or '-'}`"
+        )
+    await send_lines(ctx, lines)
+
+# ====== PUPPET BOT SETUP ======
+puppet_bot = discord.Client(**client_options("puppet"))
+event_meter.watch("puppet <<", puppet_bot)
+puppet_relay = PuppetRelay(puppet_bot)
 
 @puppet_bot.event
 async def on_ready():
-    print(f"🤖 Puppet Bot Logged in as {puppet_bot.user}")
+    log.info("🤖 Puppet Bot Logged in as %s", puppet_bot.user)
 
 @puppet_bot.event
 async def on_message(message):
@@ -123,28 +360,33 @@ async def on_message(message):
 
     if message.content.startswith("<<"):
         new_content = message.content[2:].lstrip()
+        await puppet_relay.relay(message, new_content)
 
-        try:
-            await message.delete()
-        except discord.Forbidden:
-            print(f"❌ Can't delete message in {message.channel}")
-        except discord.HTTPException as e:
-            print(f"❌ Failed to delete message: {e}")
-
-        try:
-            await message.channel.send(new_content)
-        except Exception as e:
-            print(f"❌ Failed to resend message: {e}")
-
-# ====== THREADING RUNNER ======
-def run_puppet():
-    asyncio.run(puppet_bot.start(PUPPET_BOT_TOKEN))
-
-threading.Thread(target=run_puppet, name="PuppetBotThread", daemon=True).start()
+# ====== RUNNER ======
+# Every client shares this loop and HTTP connector; cogs add their own
+# clients through main_bot.runner.attach()
+runner = MultiClientRunner()
+main_bot.runner = runner
+runner.add(main_bot, MAIN_BOT_TOKEN, primary=True)
+# The puppets connect once per cluster, not once per process
+if IS_PRIMARY_CLUSTER:
+    runner.add(puppet_bot, PUPPET_BOT_TOKEN)
 
 # ====== START MAIN BOT ======
 async def main():
-    await main_bot.start(MAIN_BOT_TOKEN)
+    # One log file per cluster process so workers don't rotate each other's files
+    setup_logging(f"-{CLUSTER_ID}" if SHARD_IDS is not None else "")
+    stall_watchdog.start(asyncio.get_running_loop())
+    event_meter.start()
+    # One listening port per cluster, so only the primary process serves the page
+    serve_intake = INTAKE_ENABLED and IS_PRIMARY_CLUSTER
+    if serve_intake:
+        await template_intake.start()
+    try:
+        await runner.run()
+    finally:
+        if serve_intake:
+            await template_intake.stop()
 
 if __name__ == "__main__":
     asyncio.run(main())
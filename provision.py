@@ -0,0 +1,132 @@
+# provision.py
+# One-shot structure import over Discord's REST API only: no gateway
+# connection, no cogs, no slash command sync, no puppet clients. Meant for
+# provisioning scripts.
+#
+#   UTILITATION_TOKEN=... python provision.py --guild 123456789 structure.json
+#   UTILITATION_TOKEN=... python provision.py --guild 123456789 --resume ab12cd34
+#
+# Exit codes: 0 done, 1 finished with errors, 2 bad template or arguments.
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+import discord
+
+from structure import (
+    JOURNAL_DB_PATH,
+    ROLLOUT_RATE,
+    ImportJournal,
+    RateBudget,
+    StructureError,
+    apply_structure,
+    compile_structure,
+    missing_overwrite_targets,
+)
+
+
+class RestGuild:
+    """A REST-fetched discord.Guild whose cache we keep current ourselves.
+
+    Without a gateway no GUILD_ROLE_CREATE / CHANNEL_CREATE events arrive, so
+    objects created here are added to the guild's cache by hand. Everything
+    else is passed straight through to the wrapped guild.
+    """
+
+    def __init__(self, guild: discord.Guild):
+        self._guild = guild
+
+    def __getattr__(self, name):
+        return getattr(self._guild, name)
+
+    async def create_role(self, **kwargs) -> discord.Role:
+        role = await self._guild.create_role(**kwargs)
+        self._guild._add_role(role)
+        return role
+
+    async def create_category(self, name: str, **kwargs) -> discord.CategoryChannel:
+        channel = await self._guild.create_category(name, **kwargs)
+        self._guild._add_channel(channel)
+        return channel
+
+    async def create_text_channel(self, name: str, **kwargs) -> discord.TextChannel:
+        channel = await self._guild.create_text_channel(name, **kwargs)
+        self._guild._add_channel(channel)
+        return channel
+
+    async def create_voice_channel(self, name: str, **kwargs) -> discord.VoiceChannel:
+        channel = await self._guild.create_voice_channel(name, **kwargs)
+        self._guild._add_channel(channel)
+        return channel
+
+
+async def load_guild(client: discord.Client, guild_id: int) -> RestGuild:
+    """Fetch the guild, its channels and the bot's own member: three REST calls."""
+    guild = await client.fetch_guild(guild_id, with_counts=False)
+    for channel in await guild.fetch_channels():
+        guild._add_channel(channel)
+    guild._add_member(await guild.fetch_member(client.user.id))
+    return RestGuild(guild)
+
+
+async def report(line: str):
+    print(line, flush=True)
+
+
+async def provision(token: str, guild_id: int, path: str, resume: str, rate: float) -> int:
+    journal = ImportJournal(JOURNAL_DB_PATH)
+    if resume:
+        job = journal.get_job(resume)
+        if not job or job[0] != guild_id:
+            print(f"❌ No import job `{resume}` for guild {guild_id}.", file=sys.stderr)
+            return 2
+        data, job_id = job[1], resume
+    else:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = compile_structure(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"❌ Error loading file: {e}", file=sys.stderr)
+            return 2
+        except StructureError as e:
+            print("\n".join(f"❌ {err}" for err in e.errors), file=sys.stderr)
+            return 2
+        job_id = None
+
+    client = discord.Client(intents=discord.Intents.none())
+    try:
+        await client.login(token)
+        guild = await load_guild(client, guild_id)
+        missing = missing_overwrite_targets(guild, data)
+        if missing:
+            print("\n".join(f"❌ {err}" for err in missing), file=sys.stderr)
+            return 2
+        if job_id is None:
+            job_id = journal.create_job(guild_id, data)
+        print(f"🧾 Import job {job_id} for {guild.name}", flush=True)
+        complete = await apply_structure(guild, data, report, journal, job_id, RateBudget(rate))
+    finally:
+        await client.close()
+
+    if complete:
+        print(f"🏁 Import job {job_id} finished.")
+        return 0
+    print(f"⚠️ Import job {job_id} finished with errors. Rerun with --resume {job_id}.")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply a structure template to a guild over REST only.")
+    parser.add_argument("template", nargs="?", help="structure.json produced by index.html or !exportjson")
+    parser.add_argument("--guild", type=int, required=True, help="target guild ID")
+    parser.add_argument("--token", default=os.environ.get("UTILITATION_TOKEN"), help="bot token (default: $UTILITATION_TOKEN)")
+    parser.add_argument("--resume", metavar="JOB", help="continue an interrupted import job instead of reading a template")
+    parser.add_argument("--rate", type=float, default=ROLLOUT_RATE, help="max requests per second")
+    args = parser.parse_args()
+    if not args.token:
+        parser.error("no token: pass --token or set UTILITATION_TOKEN")
+    if not args.template and not args.resume:
+        parser.error("give a template file or --resume JOB")
+    sys.exit(asyncio.run(provision(args.token, args.guild, args.template, args.resume, args.rate)))
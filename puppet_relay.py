@@ -0,0 +1,306 @@
+# puppet_relay.py
+# Shared "delete the original, repost the text" logic for the << and >>
+# puppet bots. In webhook mode the repost goes through a per-channel webhook
+# kept in a small LRU cache, created on first use and reused afterwards, and
+# the delete and the send run concurrently so a relay costs one round trip.
+#
+# Sends go through one ordered queue per channel, paced to the channel's
+# rate limit bucket; messages that pile up while waiting are joined into one
+# post when they fit, so bursts neither race nor hit 429s.
+#
+# Attachments are streamed from the CDN response straight into the outgoing
+# multipart upload one chunk at a time; they are never held whole in memory
+# or written to disk. If any attachment can't be carried over (too big for
+# the upload limit, or the CDN fetch fails) the message isn't relayed at all
+# and the original stays, since deleting it would delete its files too.
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+import aiohttp
+import discord
+
+from structure import RateBudget
+
+# ====== Config ======
+RELAY_MODE = "webhook"            # "webhook" or "send" (plain channel.send as the bot)
+WEBHOOK_NAME = "Utilitation Relay"
+WEBHOOK_CACHE_SIZE = 256          # Channels whose webhook is kept in memory
+COALESCE_BURSTS = True            # Join queued messages into one post when they fit
+CHANNEL_SEND_RATE = 1.0           # Sends/second per channel (Discord allows 5 per 5 seconds)
+CHANNEL_SEND_BURST = 5
+WEBHOOK_SEND_RATE = 0.5           # Webhook executes/second per channel (Discord allows 30 per minute)
+WEBHOOK_SEND_BURST = 5
+MAX_MESSAGE_LENGTH = 2000
+STREAM_CHUNK_SIZE = 64 * 1024     # Bytes held per attachment in flight
+MAX_OPEN_STREAMS = 16             # Attachments streaming at once across all relays (>= 10 per message)
+
+log = logging.getLogger(__name__)
+
+_stream_slots = asyncio.Semaphore(MAX_OPEN_STREAMS)
+_stream_open_lock = asyncio.Lock()
+
+
+class StreamedFile(discord.File):
+    """A discord.File whose body is an open CDN response, read chunk by chunk.
+
+    discord.File wants a seekable buffer, so its fields are set directly and
+    fp is an async generator, which aiohttp's multipart writer streams. A
+    stream can't be rewound: if discord.py retries the upload, reset() fails
+    the send instead of uploading a truncated file.
+    """
+
+    def __init__(self, response: aiohttp.ClientResponse, filename: str, release: Callable[[], None],
+                 spoiler: bool = False, description: Optional[str] = None):
+        self._response = response
+        self._release = release
+        self._closed = False
+        self.fp = self._chunks()
+        self._original_pos = 0
+        self._owner = False
+        self._closer = lambda: None
+        # File.filename adds the prefix back when spoiler is set
+        self._filename = filename.removeprefix("SPOILER_")
+        self.spoiler = spoiler
+        self.description = description
+
+    async def _chunks(self):
+        async for chunk in self._response.content.iter_chunked(STREAM_CHUNK_SIZE):
+            yield chunk
+
+    def reset(self, *, seek=True):
+        if seek:
+            raise RuntimeError(f"Can't retry upload of streamed attachment {self.filename}")
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._response.release()
+        self._release()
+
+
+class _Relayed:
+    """One queued relay: its text, the attachments being opened, and who's waiting for it."""
+
+    def __init__(self, content: str, opening: Optional[asyncio.Task], future: asyncio.Future):
+        self.content = content
+        self.opening = opening
+        self.future = future
+
+
+class _ChannelQueue:
+    def __init__(self, channel):
+        self.channel = channel
+        self.pending: Deque[_Relayed] = deque()
+        self.task: Optional[asyncio.Task] = None
+
+
+class PuppetRelay:
+    """Relays a puppet message into its channel for one client.
+
+    ``username``/``avatar_url`` set the display identity of webhook posts and
+    default to the client's own name and avatar. Channels where webhooks
+    aren't allowed fall back to a plain send.
+    """
+
+    def __init__(self, client: discord.Client, username: Optional[str] = None, avatar_url: Optional[str] = None,
+                 mode: str = RELAY_MODE, cache_size: int = WEBHOOK_CACHE_SIZE):
+        self.client = client
+        self.username = username
+        self.avatar_url = avatar_url
+        self.mode = mode
+        self.cache_size = cache_size
+        self._webhooks: "OrderedDict[int, discord.Webhook]" = OrderedDict()
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._no_webhooks: Set[int] = set()
+        self._queues: Dict[int, _ChannelQueue] = {}
+        # Outlive the queues, which are dropped whenever they run empty
+        self._budgets: "OrderedDict[int, RateBudget]" = OrderedDict()
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def relay(self, message: discord.Message, content: str):
+        # Start opening attachment streams now; the original can only be deleted once
+        # the CDN responses are open, since its attachments go away with it
+        opening = asyncio.create_task(self._open_attachments(message)) if message.attachments else None
+        # Enqueue before the first await so relays keep the order messages arrived in
+        queued = self._enqueue(message.channel, content, opening)
+        deleted, sent = await asyncio.gather(self._delete(message, opening), queued, return_exceptions=True)
+        if deleted is False:
+            log.warning("❌ Kept message in %s, its attachments can't be relayed", message.channel,
+                        extra={"channel_id": message.channel.id})
+        elif isinstance(deleted, discord.Forbidden):
+            log.warning("❌ Can't delete message in %s", message.channel, extra={"channel_id": message.channel.id})
+        elif isinstance(deleted, Exception):
+            log.error("❌ Failed to delete message: %s", deleted, extra={"channel_id": message.channel.id})
+        if isinstance(sent, Exception):
+            log.error("❌ Failed to resend message", exc_info=sent, extra={"channel_id": message.channel.id})
+
+    async def _delete(self, message: discord.Message, opening: Optional[asyncio.Task]) -> bool:
+        if opening is not None:
+            _files, failed = await opening
+            if failed:
+                return False
+        await message.delete()
+        return True
+
+    async def _open_attachments(self, message: discord.Message) -> Tuple[List[StreamedFile], List[str]]:
+        """Open a CDN stream per attachment. Returns (files, names of attachments that can't be streamed).
+
+        Opens nothing when the attachments together exceed the guild's upload limit.
+        """
+        if self._session is None or self._session.closed:
+            # Ride on the client's connector (shared by every client under runner.py)
+            connector = self.client.http.connector or None
+            self._session = aiohttp.ClientSession(connector=connector, connector_owner=connector is None)
+        limit = message.guild.filesize_limit if message.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+        files, failed = [], []
+        # The limit applies to the whole upload, not each file
+        if sum(attachment.size for attachment in message.attachments) > limit:
+            return files, [attachment.filename for attachment in message.attachments]
+        # One message reserves its slots at a time so two can't each hold half and wait forever
+        async with _stream_open_lock:
+            for attachment in message.attachments:
+                await _stream_slots.acquire()
+                try:
+                    response = await self._session.get(attachment.url)
+                    if response.status != 200:
+                        response.release()
+                        raise aiohttp.ClientResponseError(response.request_info, (), status=response.status)
+                except Exception as e:
+                    _stream_slots.release()
+                    log.warning("❌ Failed to fetch attachment %s: %s", attachment.filename, e)
+                    failed.append(attachment.filename)
+                    continue
+                files.append(StreamedFile(
+                    response, attachment.filename, _stream_slots.release,
+                    spoiler=attachment.is_spoiler(), description=attachment.description,
+                ))
+        return files, failed
+
+    def _enqueue(self, channel, content: str, opening: Optional[asyncio.Task] = None) -> asyncio.Future:
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = _ChannelQueue(channel)
+            self._queues[channel.id] = queue
+        future = asyncio.get_running_loop().create_future()
+        queue.pending.append(_Relayed(content, opening, future))
+        if queue.task is None:
+            queue.task = asyncio.create_task(self._drain(queue))
+        return future
+
+    async def _drain(self, queue: _ChannelQueue):
+        while queue.pending:
+            # Wait for the bucket first so everything queued meanwhile can join this post
+            await self._budget_for(queue.channel).acquire()
+            batch = [queue.pending.popleft()]
+            files: List[StreamedFile] = []
+            content = batch[0].content
+            try:
+                if batch[0].opening is not None:
+                    files, failed = await batch[0].opening
+                    if failed:
+                        # Not relayed; _delete keeps the original
+                        batch[0].future.set_result(None)
+                        continue
+                elif COALESCE_BURSTS:
+                    # Only plain text joins a post; a relay with attachments always goes alone
+                    length = len(content)
+                    while (queue.pending and queue.pending[0].opening is None
+                           and length + 1 + len(queue.pending[0].content) <= MAX_MESSAGE_LENGTH):
+                        length += 1 + len(queue.pending[0].content)
+                        batch.append(queue.pending.popleft())
+                    content = "\n".join(item.content for item in batch)
+                await self._send(queue.channel, content, files)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+            else:
+                for item in batch:
+                    item.future.set_result(None)
+            finally:
+                for file in files:
+                    file.close()
+        # No await between the empty check and this, so nothing can slip in unseen
+        del self._queues[queue.channel.id]
+
+    def _budget_for(self, channel) -> RateBudget:
+        """The channel's send bucket, paced to the bucket the sends will actually hit."""
+        if self.mode == "webhook" and channel.id not in self._no_webhooks:
+            rate, burst = WEBHOOK_SEND_RATE, WEBHOOK_SEND_BURST
+        else:
+            rate, burst = CHANNEL_SEND_RATE, CHANNEL_SEND_BURST
+        budget = self._budgets.get(channel.id)
+        if budget is not None and budget.rate == rate:
+            self._budgets.move_to_end(channel.id)
+            return budget
+        budget = self._budgets[channel.id] = RateBudget(rate, burst=burst)
+        if len(self._budgets) > self.cache_size:
+            self._budgets.popitem(last=False)
+        return budget
+
+    async def _send(self, channel, content: str, files: Optional[List[StreamedFile]] = None):
+        thread = None
+        parent = channel
+        if isinstance(channel, discord.Thread):
+            thread, parent = channel, channel.parent
+        webhook = None
+        if self.mode == "webhook" and isinstance(parent, discord.TextChannel):
+            webhook = await self._webhook_for(parent)
+        files = files or discord.utils.MISSING
+        if webhook is None:
+            return await channel.send(content or None, files=files)
+
+        user = self.client.user
+        try:
+            await webhook.send(
+                content or discord.utils.MISSING,
+                username=self.username or user.display_name,
+                avatar_url=self.avatar_url or user.display_avatar.url,
+                thread=thread or discord.utils.MISSING,
+                files=files,
+            )
+        except discord.NotFound:
+            # Someone deleted the webhook; forget it and post normally this time.
+            # Streams were already consumed, so relays with files can't be retried.
+            self._webhooks.pop(parent.id, None)
+            if files:
+                raise
+            await channel.send(content)
+
+    async def _webhook_for(self, channel: discord.TextChannel) -> Optional[discord.Webhook]:
+        if channel.id in self._no_webhooks:
+            return None
+        webhook = self._webhooks.get(channel.id)
+        if webhook is not None:
+            self._webhooks.move_to_end(channel.id)
+            return webhook
+        # Concurrent relays in a fresh channel wait for the same lookup instead of creating duplicates
+        if channel.id in self._pending:
+            return await asyncio.shield(self._pending[channel.id])
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[channel.id] = future
+        webhook = None
+        try:
+            webhook = await self._find_or_create(channel)
+        except discord.Forbidden:
+            self._no_webhooks.add(channel.id)
+        except discord.HTTPException as e:
+            log.warning("❌ Webhook setup failed in %s: %s", channel, e, extra={"channel_id": channel.id})
+        finally:
+            del self._pending[channel.id]
+            future.set_result(webhook)
+
+        if webhook is not None:
+            self._webhooks[channel.id] = webhook
+            if len(self._webhooks) > self.cache_size:
+                self._webhooks.popitem(last=False)
+        return webhook
+
+    async def _find_or_create(self, channel: discord.TextChannel) -> discord.Webhook:
+        for webhook in await channel.webhooks():
+            if webhook.user == self.client.user and webhook.name == WEBHOOK_NAME and webhook.token:
+                return webhook
+        return await channel.create_webhook(name=WEBHOOK_NAME)
@@ -0,0 +1,98 @@
+# runner.py
+# Hosts several discord clients (main_bot and the puppets) on one event loop.
+# All clients share one aiohttp connector (one DNS cache and connection pool)
+# and are started and shut down together, instead of each puppet getting its
+# own thread, loop and pool.
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import discord
+
+CONNECTOR_LIMIT = 100             # Total open HTTP connections shared by every client
+
+log = logging.getLogger(__name__)
+
+
+class SharedConnector(aiohttp.TCPConnector):
+    """TCPConnector that individual client sessions can't close.
+
+    discord.py's session owns its connector and closes it on Client.close(),
+    which would cut off every other client. Only shutdown() really closes it.
+    """
+
+    _shutting_down = False
+
+    def close(self, **kwargs):
+        if not self._shutting_down:
+            return asyncio.sleep(0)
+        return super().close(**kwargs)
+
+    async def shutdown(self):
+        self._shutting_down = True
+        await self.close()
+
+
+class MultiClientRunner:
+    def __init__(self):
+        self._pending: List[Tuple[discord.Client, str, bool]] = []
+        self._tasks: Dict[discord.Client, asyncio.Task] = {}
+        self._primary: List[asyncio.Task] = []
+        self.connector: Optional[SharedConnector] = None
+
+    def add(self, client: discord.Client, token: str, primary: bool = False):
+        """Register a client before run(). The runner stops when any primary client stops."""
+        self._pending.append((client, token, primary))
+
+    async def attach(self, client: discord.Client, token: str):
+        """Start a client on the already running loop, e.g. from a cog's cog_load."""
+        if client in self._tasks:
+            return
+        self._start(client, token)
+
+    async def detach(self, client: discord.Client):
+        """Close one client and forget it; the others keep running."""
+        task = self._tasks.pop(client, None)
+        if task is None:
+            return
+        await client.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    def _start(self, client: discord.Client, token: str) -> asyncio.Task:
+        # Sessions are created at login, so pointing the HTTP client at the
+        # shared connector before start() is enough
+        client.http.connector = self.connector
+        task = asyncio.create_task(client.start(token), name=f"client-{len(self._tasks)}")
+        task.add_done_callback(self._on_done)
+        self._tasks[client] = task
+        return task
+
+    def _on_done(self, task: asyncio.Task):
+        if task.cancelled() or task.exception() is None:
+            return
+        log.error("❌ Client task %s stopped", task.get_name(), exc_info=task.exception())
+
+    async def run(self):
+        """Start every registered client and block until a primary one stops, then close all."""
+        self.connector = SharedConnector(limit=CONNECTOR_LIMIT)
+        for client, token, primary in self._pending:
+            task = self._start(client, token)
+            if primary:
+                self._primary.append(task)
+        self._pending.clear()
+        try:
+            await asyncio.wait(self._primary or list(self._tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            await self.close()
+
+    async def close(self):
+        clients = list(self._tasks)
+        await asyncio.gather(*(client.close() for client in clients), return_exceptions=True)
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+        if self.connector is not None:
+            await self.connector.shutdown()
@@ -0,0 +1,109 @@
+# stall_watchdog.py
+# Watchdog thread that measures event loop lag and, while the loop is stuck,
+# samples the loop thread's Python stack to show what is blocking it (a
+# synchronous StockDB call, market_tick, a slow command...).
+#
+# The thread pings the loop with call_soon_threadsafe. If the ping isn't
+# answered within STALL_THRESHOLD the loop is blocked right now, so the stack
+# taken at that moment is the code responsible.
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+STALL_THRESHOLD = 0.25            # Seconds without an answer before the loop counts as stalled
+CHECK_INTERVAL = 0.5              # Seconds between pings while the loop is healthy
+STALL_HISTORY = 50                # Stalls kept for !stalls
+STACK_DEPTH = 20                  # Frames kept per sample
+
+_REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+log = logging.getLogger(__name__)
+
+
+class StallWatchdog:
+    def __init__(self, threshold: float = STALL_THRESHOLD, interval: float = CHECK_INTERVAL, history: int = STALL_HISTORY):
+        self.threshold = threshold
+        self.interval = interval
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self.last_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Call from the loop's own thread, e.g. at the top of main()."""
+        self._loop = loop
+        self._loop_thread_id = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name="StallWatchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            answered = threading.Event()
+            sent = time.monotonic()
+            try:
+                self._loop.call_soon_threadsafe(answered.set)
+            except RuntimeError:
+                return  # Loop closed
+            if answered.wait(self.threshold):
+                self.last_lag = time.monotonic() - sent
+                self._stop.wait(self.interval)
+                continue
+
+            # Blocked right now: sample before it recovers
+            stall = self._sample()
+            while not answered.wait(1.0):
+                if self._stop.is_set() or self._loop.is_closed():
+                    return
+            stall["duration"] = self.last_lag = time.monotonic() - sent
+            self.history.append(stall)
+            log.warning(
+                "🐢 Event loop stalled %.2fs in %s (task %s, command %s)\n%s",
+                stall["duration"], stall["where"], stall["task"], stall["command"] or "-", "".join(stall["stack"]),
+                extra={"stall_seconds": round(stall["duration"], 3), "where": stall["where"], "command": stall["command"]},
+            )
+
+    def _sample(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task = asyncio.current_task(self._loop)
+        stack = traceback.extract_stack(frame, limit=STACK_DEPTH) if frame else []
+        return {
+            "started": time.time(),
+            "duration": 0.0,
+            "task": task.get_name() if task else "-",
+            "command": _command_in(frame),
+            "where": _innermost_repo_frame(stack),
+            "stack": traceback.format_list(stack),
+        }
+
+
+def _innermost_repo_frame(stack: List[traceback.FrameSummary]) -> str:
+    """The deepest frame in this repo's code, else the deepest frame at all."""
+    for entry in reversed(stack):
+        if entry.filename.startswith(_REPO_DIR):
+            return f"{os.path.relpath(entry.filename, _REPO_DIR)}:{entry.lineno} {entry.name}"
+    if stack:
+        return f"{os.path.basename(stack[-1].filename)}:{stack[-1].lineno} {stack[-1].name}"
+    return "unknown"
+
+
+def _command_in(frame) -> Optional[str]:
+    """Name of the prefix or slash command whose ctx/interaction is on the stack, if any."""
+    while frame is not None:
+        local_vars = frame.f_locals
+        for key in ("ctx", "interaction", "origin"):
+            command = getattr(local_vars.get(key), "command", None)
+            if command is not None:
+                return getattr(command, "qualified_name", None) or str(command)
+        frame = frame.f_back
+    return None
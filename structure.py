@@ -0,0 +1,862 @@
+# structure.py
+# Helpers for the structure template format produced by index.html and
+# consumed by !importjson. Kept free of bot state so other entry points can
+# reuse it without starting any clients.
+import asyncio
+import hashlib
+import io
+import json
+import re
+import secrets
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+# ====== SCHEMA ======
+CHANNEL_TYPES = ("text", "voice")
+MAX_NAME_LENGTH = 100             # Discord limit for role and channel names
+MAX_TOPIC_LENGTH = 1024           # Discord limit for text channel topics
+EVERYONE = "@everyone"            # Overwrite target for the guild's default role
+DEFAULT_ROLE_COLOR = 0xFFFFFF     # Matches the old "0xffffff" fallback
+MAX_REPORTED_ERRORS = 20          # Keep the error reply under Discord's message limit
+JOURNAL_DB_PATH = "data/imports.sqlite3"
+TEMPLATE_DB_PATH = "data/templates.sqlite3"
+ITEM_DELAY_SECONDS = 1            # Pause between created objects
+ROLLOUT_RATE = 40                 # Requests/second shared by a rollout (Discord's global limit is 50)
+ROLLOUT_MAX_GUILDS = 8            # Guilds imported at the same time; each guild runs one request at a time
+
+_COLOR_RE = re.compile(r"^(?:#|0x)?([0-9a-fA-F]{6})$")
+
+# Permission name -> bit, compiled once so a role's Permissions is one integer OR
+PERMISSION_BITS: Dict[str, int] = dict(discord.Permissions.VALID_FLAGS)
+# Bit -> one canonical name (aliases dropped) for turning bitmasks back into lists
+PERMISSION_NAMES: Dict[int, str] = {}
+for _name, _bit in PERMISSION_BITS.items():
+    PERMISSION_NAMES.setdefault(_bit, _name)
+
+
+class StructureError(Exception):
+    """Raised when a structure file fails validation. Holds every problem found."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} problem(s) in structure file")
+
+
+# ====== VALIDATION ======
+def _check_name(value: Any, path: str, errors: List[str]) -> str:
+    if not isinstance(value, str) or not value.strip():
+        errors.append(f"{path}: name must be a non-empty string")
+        return ""
+    if len(value) > MAX_NAME_LENGTH:
+        errors.append(f"{path}: name is longer than {MAX_NAME_LENGTH} characters")
+    return value
+
+
+def _check_color(value: Any, path: str, errors: List[str]) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        if 0 <= value <= 0xFFFFFF:
+            return value
+    elif isinstance(value, str):
+        match = _COLOR_RE.match(value.strip())
+        if match:
+            return int(match.group(1), 16)
+    errors.append(f"{path}: invalid color {value!r}, expected a hex code like \"#FF5733\"")
+    return 0
+
+
+def _check_permissions(value: Any, path: str, errors: List[str]) -> int:
+    if not isinstance(value, list):
+        errors.append(f"{path}: permissions must be a list of names")
+        return 0
+    bits = 0
+    for i, name in enumerate(value):
+        bit = PERMISSION_BITS.get(name) if isinstance(name, str) else None
+        if bit is None:
+            errors.append(f"{path}[{i}]: unknown permission {name!r}")
+            continue
+        bits |= bit
+    return bits
+
+
+def _check_overwrites(value: Any, path: str, errors: List[str], known_roles: set) -> List[Dict[str, Any]]:
+    """Compile {"Role": {"allow": [...], "deny": [...]}} into target/allow/deny bitmasks.
+
+    Targets that aren't roles in this template are kept; they must exist in the
+    guild and are checked by missing_overwrite_targets() before importing.
+    """
+    if not isinstance(value, dict):
+        errors.append(f"{path}: overwrites must be an object of role name -> {{allow, deny}}")
+        return []
+    compiled = []
+    for target, pair in value.items():
+        target_path = f"{path}[{json.dumps(target)}]"
+        if not isinstance(pair, dict):
+            errors.append(f"{target_path}: must be an object with 'allow' and/or 'deny'")
+            continue
+        allow = _check_permissions(pair.get("allow", []), f"{target_path}.allow", errors)
+        deny = _check_permissions(pair.get("deny", []), f"{target_path}.deny", errors)
+        if allow & deny:
+            errors.append(f"{target_path}: the same permission is both allowed and denied")
+        compiled.append({"target": target, "allow": allow, "deny": deny, "external": target != EVERYONE and target not in known_roles})
+    return compiled
+
+
+def _check_list(data: Dict[str, Any], key: str, path: str, errors: List[str]) -> List[Any]:
+    value = data.get(key, [])
+    if not isinstance(value, list):
+        errors.append(f"{path}.{key}: must be a list")
+        return []
+    return value
+
+
+def compile_structure(data: Any) -> Dict[str, Any]:
+    """Validate a whole structure document before any API call is made.
+
+    Returns a normalized copy where colors are ints and permissions are
+    bitmasks. Raises StructureError listing every problem with its JSON path.
+
+    Roles are listed highest first and categories/channels in display order;
+    importjson applies that order in bulk once everything exists.
+    """
+    errors: List[str] = []
+    if not isinstance(data, dict):
+        raise StructureError(["$: top level must be an object with 'roles' and 'categories'"])
+
+    roles = []
+    seen_roles = set()
+    for i, role_info in enumerate(_check_list(data, "roles", "$", errors)):
+        path = f"$.roles[{i}]"
+        if not isinstance(role_info, dict):
+            errors.append(f"{path}: must be an object")
+            continue
+        name = _check_name(role_info.get("name"), f"{path}.name", errors)
+        if name in seen_roles:
+            errors.append(f"{path}.name: duplicate role {name!r}")
+        seen_roles.add(name)
+        roles.append({
+            "name": name,
+            "color": _check_color(role_info.get("color", DEFAULT_ROLE_COLOR), f"{path}.color", errors),
+            "permissions": _check_permissions(role_info.get("permissions", []), f"{path}.permissions", errors),
+        })
+
+    categories = []
+    seen_categories = set()
+    for i, cat_info in enumerate(_check_list(data, "categories", "$", errors)):
+        path = f"$.categories[{i}]"
+        if not isinstance(cat_info, dict):
+            errors.append(f"{path}: must be an object")
+            continue
+        # Categories are matched by name on import, so two with one name would merge
+        cat_name = _check_name(cat_info.get("name"), f"{path}.name", errors)
+        if cat_name in seen_categories:
+            errors.append(f"{path}.name: duplicate category {cat_name!r}")
+        seen_categories.add(cat_name)
+        channels = []
+        seen_channels = set()
+        for j, channel_info in enumerate(_check_list(cat_info, "channels", path, errors)):
+            chan_path = f"{path}.channels[{j}]"
+            if not isinstance(channel_info, dict):
+                errors.append(f"{chan_path}: must be an object")
+                continue
+            chan_name = _check_name(channel_info.get("name"), f"{chan_path}.name", errors)
+            if chan_name in seen_channels:
+                errors.append(f"{chan_path}.name: duplicate channel {chan_name!r} in this category")
+            seen_channels.add(chan_name)
+            chan_type = channel_info.get("type", "text")
+            if chan_type not in CHANNEL_TYPES:
+                errors.append(f"{chan_path}.type: unknown channel type {chan_type!r}, expected one of {', '.join(CHANNEL_TYPES)}")
+            topic = channel_info.get("topic") or None
+            if topic is not None:
+                if not isinstance(topic, str):
+                    errors.append(f"{chan_path}.topic: must be a string")
+                elif len(topic) > MAX_TOPIC_LENGTH:
+                    errors.append(f"{chan_path}.topic: longer than {MAX_TOPIC_LENGTH} characters")
+                elif chan_type != "text":
+                    errors.append(f"{chan_path}.topic: only text channels have topics")
+            channels.append({
+                "name": chan_name,
+                "type": chan_type,
+                "topic": topic,
+                "overwrites": _check_overwrites(channel_info.get("overwrites", {}), f"{chan_path}.overwrites", errors, seen_roles),
+            })
+        categories.append({
+            "name": cat_name,
+            "channels": channels,
+            "overwrites": _check_overwrites(cat_info.get("overwrites", {}), f"{path}.overwrites", errors, seen_roles),
+        })
+
+    if errors:
+        raise StructureError(errors)
+    return {"roles": roles, "categories": categories}
+
+
+def missing_overwrite_targets(guild: discord.Guild, data: Dict[str, Any]) -> List[str]:
+    """Overwrite targets that are neither template roles nor roles already in the guild."""
+    existing = {role.name for role in guild.roles}
+    missing = []
+    for i, cat_info in enumerate(data["categories"]):
+        entries = [(f"$.categories[{i}]", cat_info)]
+        entries += [(f"$.categories[{i}].channels[{j}]", c) for j, c in enumerate(cat_info["channels"])]
+        for path, info in entries:
+            for ow in info.get("overwrites", []):
+                if ow["external"] and ow["target"] not in existing:
+                    missing.append(f"{path}.overwrites: no role named {ow['target']!r} in the template or this server")
+    return missing
+
+
+def format_errors(errors: List[str]) -> str:
+    """Render validation errors as a single chat message."""
+    shown = "\n".join(f"• `{e}`" for e in errors[:MAX_REPORTED_ERRORS])
+    if len(errors) > MAX_REPORTED_ERRORS:
+        shown += f"\n…and {len(errors) - MAX_REPORTED_ERRORS} more."
+    message = f"❌ Structure file has {len(errors)} problem(s), nothing was created:\n{shown}"
+    return message[:2000]
+
+
+# ====== EXPORT ======
+def _permission_list(value: int) -> List[str]:
+    return [name for bit, name in PERMISSION_NAMES.items() if value & bit]
+
+
+def _export_overwrites(channel: discord.abc.GuildChannel, exported_roles: set) -> Dict[str, Dict[str, List[str]]]:
+    overwrites = {}
+    for target, overwrite in channel.overwrites.items():
+        if not isinstance(target, discord.Role):
+            continue  # Member overwrites don't carry over to another server
+        name = EVERYONE if target.is_default() else target.name
+        if name != EVERYONE and name not in exported_roles:
+            continue
+        allow, deny = overwrite.pair()
+        overwrites[name] = {"allow": _permission_list(allow.value), "deny": _permission_list(deny.value)}
+    return overwrites
+
+
+def export_structure(guild: discord.Guild, include_overwrites: bool = False) -> Tuple[Dict[str, Any], int]:
+    """Serialize a guild into the index.html template format in one pass over the cache.
+
+    No REST calls are made. Returns (template, skipped) where skipped counts
+    objects the format can't represent: managed or duplicate roles, channels
+    outside a category, non text/voice channels, duplicate channel names and
+    categories (with their channels) whose name an earlier category already has.
+    """
+    skipped = 0
+    roles = []
+    exported_roles = set()
+    for role in sorted(guild.roles, reverse=True):
+        if role.is_default():
+            continue
+        if role.managed or role.name in exported_roles:
+            skipped += 1
+            continue
+        exported_roles.add(role.name)
+        roles.append({
+            "name": role.name,
+            "color": f"#{role.color.value:06x}",
+            "permissions": _permission_list(role.permissions.value),
+        })
+
+    categories = []
+    exported_categories = set()
+    for category, channels in guild.by_category():
+        if category is None:
+            skipped += len(channels)
+            continue
+        # Import matches categories by name, so a second one would merge into the first
+        if category.name in exported_categories:
+            skipped += 1 + len(channels)
+            continue
+        exported_categories.add(category.name)
+        exported = []
+        seen = set()
+        for channel in channels:
+            if isinstance(channel, discord.TextChannel):
+                chan_type = "text"
+            elif isinstance(channel, discord.VoiceChannel):
+                chan_type = "voice"
+            else:
+                skipped += 1
+                continue
+            if channel.name in seen:
+                skipped += 1
+                continue
+            seen.add(channel.name)
+            entry = {"name": channel.name, "type": chan_type}
+            if chan_type == "text" and channel.topic:
+                entry["topic"] = channel.topic
+            if include_overwrites and not channel.permissions_synced:
+                entry["overwrites"] = _export_overwrites(channel, exported_roles)
+            exported.append(entry)
+        cat_entry = {"name": category.name, "channels": exported}
+        if include_overwrites:
+            cat_entry["overwrites"] = _export_overwrites(category, exported_roles)
+        categories.append(cat_entry)
+
+    return {"roles": roles, "categories": categories}, skipped
+
+
+def export_file(guild: discord.Guild, include_overwrites: bool = False) -> Tuple[discord.File, int]:
+    """export_structure() wrapped as an in-memory structure.json attachment."""
+    data, skipped = export_structure(guild, include_overwrites)
+    buffer = io.BytesIO(json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"))
+    return discord.File(buffer, filename="structure.json"), skipped
+
+
+# ====== JOURNAL ======
+class ImportJournal:
+    """Checkpoint journal so an interrupted import can pick up where it stopped.
+
+    Each job stores its normalized template and one row per completed step
+    (``role:<i>``, ``category:<i>``, ``channel:<i>:<j>``) with the ID of the
+    object it created or matched.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def _init_db(self):
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS import_jobs (
+                    id TEXT PRIMARY KEY,
+                    guild_id INTEGER NOT NULL,
+                    template TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at INTEGER NOT NULL
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS import_steps (
+                    job_id TEXT NOT NULL,
+                    step TEXT NOT NULL,
+                    object_id INTEGER,
+                    PRIMARY KEY (job_id, step),
+                    FOREIGN KEY(job_id) REFERENCES import_jobs(id)
+                );
+                """
+            )
+            con.commit()
+
+    def create_job(self, guild_id: int, data: Dict[str, Any]) -> str:
+        job_id = secrets.token_hex(4)
+        with self._connect() as con:
+            con.execute(
+                "INSERT INTO import_jobs (id, guild_id, template, status, created_at) VALUES (?, ?, ?, 'running', strftime('%s','now'))",
+                (job_id, guild_id, json.dumps(data)),
+            )
+            con.commit()
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Tuple[int, Dict[str, Any], str]]:
+        """Returns (guild_id, normalized_template, status) or None."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("SELECT guild_id, template, status FROM import_jobs WHERE id = ?", (job_id,))
+            row = cur.fetchone()
+            return (row[0], json.loads(row[1]), row[2]) if row else None
+
+    def set_status(self, job_id: str, status: str):
+        with self._connect() as con:
+            con.execute("UPDATE import_jobs SET status = ? WHERE id = ?", (status, job_id))
+            con.commit()
+
+    def completed_steps(self, job_id: str) -> Dict[str, Optional[int]]:
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute("SELECT step, object_id FROM import_steps WHERE job_id = ?", (job_id,))
+            return dict(cur.fetchall())
+
+    def mark_step(self, job_id: str, step: str, object_id: Optional[int]):
+        with self._connect() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO import_steps (job_id, step, object_id) VALUES (?, ?, ?)",
+                (job_id, step, object_id),
+            )
+            con.commit()
+
+
+# ====== TEMPLATE LIBRARY ======
+class TemplateStore:
+    """Named, versioned templates per guild, stored already validated and normalized.
+
+    Bodies are deduplicated by the SHA-256 of their canonical JSON, so saving
+    the same structure under several names or re-saving it costs nothing.
+    Decoded bodies are kept in memory by hash since they never change.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._decoded: Dict[str, Dict[str, Any]] = {}
+        self._init_db()
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def _init_db(self):
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS template_bodies (
+                    hash TEXT PRIMARY KEY,
+                    body TEXT NOT NULL
+                );
+                """
+            )
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS templates (
+                    guild_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    hash TEXT NOT NULL,
+                    created_at INTEGER NOT NULL,
+                    PRIMARY KEY (guild_id, name, version),
+                    FOREIGN KEY(hash) REFERENCES template_bodies(hash)
+                );
+                """
+            )
+            con.commit()
+
+    def save(self, guild_id: int, name: str, data: Dict[str, Any]) -> Tuple[int, str, bool]:
+        """Store a compiled template. Returns (version, hash, is_new_version).
+
+        Saving content identical to the latest version of ``name`` is a no-op.
+        """
+        body = json.dumps(data, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                "SELECT version, hash FROM templates WHERE guild_id = ? AND name = ? ORDER BY version DESC LIMIT 1",
+                (guild_id, name),
+            )
+            row = cur.fetchone()
+            if row and row[1] == digest:
+                return row[0], digest, False
+            version = row[0] + 1 if row else 1
+            cur.execute("INSERT OR IGNORE INTO template_bodies (hash, body) VALUES (?, ?)", (digest, body))
+            cur.execute(
+                "INSERT INTO templates (guild_id, name, version, hash, created_at) VALUES (?, ?, ?, ?, strftime('%s','now'))",
+                (guild_id, name, version, digest),
+            )
+            con.commit()
+        self._decoded[digest] = data
+        return version, digest, True
+
+    def load(self, guild_id: int, name: str, version: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+        """Returns (version, compiled_template) for a version (latest by default) or None."""
+        with self._connect() as con:
+            cur = con.cursor()
+            if version is None:
+                cur.execute(
+                    "SELECT version, hash FROM templates WHERE guild_id = ? AND name = ? ORDER BY version DESC LIMIT 1",
+                    (guild_id, name),
+                )
+            else:
+                cur.execute(
+                    "SELECT version, hash FROM templates WHERE guild_id = ? AND name = ? AND version = ?",
+                    (guild_id, name, version),
+                )
+            row = cur.fetchone()
+            if not row:
+                return None
+            found_version, digest = row
+            if digest not in self._decoded:
+                cur.execute("SELECT body FROM template_bodies WHERE hash = ?", (digest,))
+                self._decoded[digest] = json.loads(cur.fetchone()[0])
+        return found_version, self._decoded[digest]
+
+    def list_templates(self, guild_id: int) -> List[Tuple[str, int, str]]:
+        """Returns (name, latest_version, hash) for every template of a guild."""
+        with self._connect() as con:
+            cur = con.cursor()
+            cur.execute(
+                """
+                SELECT t.name, t.version, t.hash
+                FROM templates t
+                JOIN (
+                    SELECT name, MAX(version) AS version FROM templates WHERE guild_id = ? GROUP BY name
+                ) latest ON latest.name = t.name AND latest.version = t.version
+                WHERE t.guild_id = ?
+                ORDER BY t.name COLLATE NOCASE
+                """,
+                (guild_id, guild_id),
+            )
+            return cur.fetchall()
+
+
+def _diff_overwrites(old: List[Dict[str, Any]], new: List[Dict[str, Any]]) -> bool:
+    pairs = lambda ows: {ow["target"]: (ow["allow"], ow["deny"]) for ow in ows}
+    return pairs(old) != pairs(new)
+
+
+def diff_structures(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Human-readable differences between two compiled templates, matched by name."""
+    lines = []
+    old_roles = {r["name"]: r for r in old["roles"]}
+    new_roles = {r["name"]: r for r in new["roles"]}
+    for name in old_roles.keys() - new_roles.keys():
+        lines.append(f"- role `{name}`")
+    for name, role in new_roles.items():
+        before = old_roles.get(name)
+        if before is None:
+            lines.append(f"+ role `{name}`")
+            continue
+        changed = [key for key in ("color", "permissions") if before[key] != role[key]]
+        if changed:
+            lines.append(f"~ role `{name}`: {', '.join(changed)}")
+    kept_old = [r["name"] for r in old["roles"] if r["name"] in new_roles]
+    kept_new = [r["name"] for r in new["roles"] if r["name"] in old_roles]
+    if kept_old != kept_new:
+        lines.append("~ role order")
+
+    old_cats = {c["name"]: c for c in old["categories"]}
+    new_cats = {c["name"]: c for c in new["categories"]}
+    for name in old_cats.keys() - new_cats.keys():
+        lines.append(f"- category `{name}` ({len(old_cats[name]['channels'])} channel(s))")
+    for name, cat in new_cats.items():
+        before = old_cats.get(name)
+        if before is None:
+            lines.append(f"+ category `{name}` ({len(cat['channels'])} channel(s))")
+            continue
+        if _diff_overwrites(before.get("overwrites", []), cat.get("overwrites", [])):
+            lines.append(f"~ category `{name}`: overwrites")
+        old_chans = {c["name"]: c for c in before["channels"]}
+        new_chans = {c["name"]: c for c in cat["channels"]}
+        for chan_name in old_chans.keys() - new_chans.keys():
+            lines.append(f"- channel `{name}/{chan_name}`")
+        for chan_name, chan in new_chans.items():
+            prev = old_chans.get(chan_name)
+            if prev is None:
+                lines.append(f"+ channel `{name}/{chan_name}` ({chan['type']})")
+                continue
+            changed = [key for key in ("type", "topic") if prev.get(key) != chan.get(key)]
+            if _diff_overwrites(prev.get("overwrites", []), chan.get("overwrites", [])):
+                changed.append("overwrites")
+            if changed:
+                lines.append(f"~ channel `{name}/{chan_name}`: {', '.join(changed)}")
+    return lines
+
+
+# ====== RATE BUDGET ======
+class RateBudget:
+    """Token bucket shared by concurrent imports so together they stay under a request rate."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, so the budget is handed out first come first served
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# ====== IMPORT ======
+def _build_overwrites(
+    overwrites: List[Dict[str, Any]],
+    guild: discord.Guild,
+    roles_by_name: Dict[str, discord.Role],
+) -> Tuple[Dict[discord.Role, discord.PermissionOverwrite], List[str]]:
+    """Overwrites keyed by role, and the names of target roles that don't exist (e.g. their creation failed)."""
+    built, missing = {}, []
+    for ow in overwrites:
+        role = guild.default_role if ow["target"] == EVERYONE else roles_by_name.get(ow["target"])
+        if role is None:
+            missing.append(ow["target"])
+            continue
+        built[role] = discord.PermissionOverwrite.from_pair(
+            discord.Permissions(ow["allow"]), discord.Permissions(ow["deny"])
+        )
+    return built, missing
+
+
+def _role_positions(guild: discord.Guild, template_roles: List[discord.Role]) -> Dict[discord.Role, int]:
+    """Positions that stack the template roles, in order, right under the bot's top role.
+
+    Roles the bot can't move (at or above its own top role) are left alone.
+    The Role objects returned by create/edit don't follow later moves, so each
+    one is looked up again in the guild cache, and every template role is
+    sent even if its cached position already looks right. Other roles are
+    only included when their position changes.
+    """
+    top = guild.me.top_role
+    current = [guild.get_role(r.id) or r for r in template_roles]
+    movable = [r for r in current if r < top]
+    template_ids = {r.id for r in movable}
+    others = [
+        r for r in sorted(guild.roles, reverse=True)
+        if r < top and not r.is_default() and r.id not in template_ids
+    ]
+    positions = {}
+    for position, role in zip(range(top.position - 1, 0, -1), movable + others):
+        if role.id in template_ids or role.position != position:
+            positions[role] = position
+    return positions
+
+
+def _template_order(current: List[Any], template: List[Any]) -> List[Any]:
+    """``current`` with the template objects put in template order, in the places the template objects hold.
+
+    Everything else keeps its place. Template objects not listed in ``current``
+    yet (the cache hasn't seen them created) go at the end.
+    """
+    ids = {obj.id for obj in template}
+    remaining = iter(template)
+    return [next(remaining) if obj.id in ids else obj for obj in current] + list(remaining)
+
+
+def _channel_positions(
+    guild: discord.Guild,
+    template_categories: List[Tuple[discord.CategoryChannel, List[discord.abc.GuildChannel]]],
+) -> List[Dict[str, int]]:
+    """Bulk position payload that orders the template categories, and their channels, as in the template.
+
+    Categories and channels the import didn't create or match keep their
+    place; they only get an entry when their position number has to shift.
+    """
+    def by_position(channels):
+        return sorted(channels, key=lambda c: (c.position, c.id))
+
+    payload = []
+    categories = _template_order(by_position(guild.categories), [cat for cat, _ in template_categories])
+    for position, category in enumerate(categories):
+        if category.position != position:
+            payload.append({"id": category.id, "position": position})
+    for category, channels in template_categories:
+        for position, channel in enumerate(_template_order(by_position(category.channels), channels)):
+            if channel.position != position:
+                payload.append({"id": channel.id, "position": position})
+    return payload
+
+
+async def apply_structure(
+    guild: discord.Guild,
+    data: Dict[str, Any],
+    report: Callable[[str], Awaitable[Any]],
+    journal: Optional[ImportJournal] = None,
+    job_id: Optional[str] = None,
+    budget: Optional[RateBudget] = None,
+) -> bool:
+    """Create the roles, categories and channels of a compiled structure.
+
+    ``report`` receives one progress line per object. When a journal is given,
+    every finished step is checkpointed and steps already recorded for
+    ``job_id`` are skipped without touching the API. Topics and permission
+    overwrites are sent with the create call, and ordering is applied at the
+    end with one bulk role and one bulk channel position update. With a
+    ``budget`` every API call draws from it instead of sleeping a fixed
+    ITEM_DELAY_SECONDS after each object. Returns True when every step
+    completed.
+    """
+    done = journal.completed_steps(job_id) if journal else {}
+    complete = True
+    roles_by_name = {role.name: role for role in guild.roles}
+
+    def checkpoint(step: str, object_id: Optional[int]):
+        if journal:
+            journal.mark_step(job_id, step, object_id)
+
+    async def before_call():
+        if budget:
+            await budget.acquire()
+
+    async def after_call():
+        if budget is None:
+            await asyncio.sleep(ITEM_DELAY_SECONDS)
+
+    # === Roles ===
+    template_roles = []
+    for i, role_info in enumerate(data["roles"]):
+        step = f"role:{i}"
+        name = role_info["name"]
+        if step in done:
+            role = guild.get_role(done[step]) or roles_by_name.get(name)
+            if role:
+                # Found by id even if renamed since; overwrites still refer to the template name
+                roles_by_name[name] = role
+                template_roles.append(role)
+            continue
+
+        existing = roles_by_name.get(name)
+        if existing:
+            await report(f"⚠️ Role `{name}` already exists, skipping.")
+            checkpoint(step, existing.id)
+            template_roles.append(existing)
+            continue
+
+        try:
+            await before_call()
+            role = await guild.create_role(
+                name=name,
+                color=discord.Color(role_info["color"]),
+                permissions=discord.Permissions(role_info["permissions"]),
+            )
+            checkpoint(step, role.id)
+            roles_by_name[name] = role
+            template_roles.append(role)
+            await after_call()
+            await report(f"✅ Created role: `{name}`")
+        except Exception as e:
+            complete = False
+            await report(f"❌ Failed to create role `{name}`: {e}")
+
+    # === Categories and Channels ===
+    template_categories = []
+    for i, cat_info in enumerate(data["categories"]):
+        step = f"category:{i}"
+        cat_name = cat_info["name"]
+        category = guild.get_channel(done[step]) if done.get(step) else None
+        if category is None:
+            category = discord.utils.get(guild.categories, name=cat_name)
+        if category is None:
+            # Creating it without some of its overwrites would be journaled as done
+            overwrites, missing = _build_overwrites(cat_info.get("overwrites", []), guild, roles_by_name)
+            if missing:
+                complete = False
+                await report(f"❌ Skipped category `{cat_name}`, missing role(s) for its overwrites: {', '.join(missing)}")
+                continue
+            try:
+                await before_call()
+                category = await guild.create_category(name=cat_name, overwrites=overwrites)
+            except Exception as e:
+                complete = False
+                await report(f"❌ Error creating category `{cat_name}`: {e}")
+                continue
+            await report(f"📁 Created category: `{cat_name}`")
+            await after_call()
+        if step not in done:
+            checkpoint(step, category.id)
+
+        channels = []
+        for j, channel_info in enumerate(cat_info["channels"]):
+            chan_step = f"channel:{i}:{j}"
+            chan_name = channel_info["name"]
+            if chan_step in done:
+                channel = guild.get_channel(done[chan_step]) or discord.utils.get(category.channels, name=chan_name)
+                if channel:
+                    channels.append(channel)
+                continue
+            chan_type = channel_info["type"]
+            existing = discord.utils.get(category.channels, name=chan_name)
+            if existing:
+                await report(f"⚠️ Channel `{chan_name}` already exists, skipping.")
+                checkpoint(chan_step, existing.id)
+                channels.append(existing)
+                continue
+
+            # Without explicit overwrites Discord syncs the channel to its category
+            kwargs = {"name": chan_name, "category": category}
+            if channel_info.get("overwrites"):
+                overwrites, missing = _build_overwrites(channel_info["overwrites"], guild, roles_by_name)
+                if missing:
+                    complete = False
+                    await report(f"❌ Skipped channel `{chan_name}`, missing role(s) for its overwrites: {', '.join(missing)}")
+                    continue
+                kwargs["overwrites"] = {**category.overwrites, **overwrites}
+            try:
+                await before_call()
+                if chan_type == "text":
+                    if channel_info.get("topic"):
+                        kwargs["topic"] = channel_info["topic"]
+                    channel = await guild.create_text_channel(**kwargs)
+                elif chan_type == "voice":
+                    channel = await guild.create_voice_channel(**kwargs)
+                checkpoint(chan_step, channel.id)
+                channels.append(channel)
+                await report(f"📨 Created channel: `{chan_name}`")
+                await after_call()
+            except Exception as e:
+                complete = False
+                await report(f"❌ Error creating channel `{chan_name}`: {e}")
+        template_categories.append((category, channels))
+
+    # === Ordering (one bulk call each) ===
+    if "order:roles" not in done and template_roles:
+        try:
+            positions = _role_positions(guild, template_roles)
+            if positions:
+                await before_call()
+                await guild.edit_role_positions(positions=positions)
+                await report(f"↕️ Ordered {len(positions)} role(s).")
+            checkpoint("order:roles", None)
+        except Exception as e:
+            complete = False
+            await report(f"❌ Failed to order roles: {e}")
+
+    if "order:channels" not in done and template_categories:
+        try:
+            payload = _channel_positions(guild, template_categories)
+            if payload:
+                await before_call()
+                await guild._state.http.bulk_channel_update(guild.id, payload)
+                await report(f"↕️ Ordered {len(payload)} channel(s) and categories.")
+            checkpoint("order:channels", None)
+        except Exception as e:
+            complete = False
+            await report(f"❌ Failed to order channels: {e}")
+
+    if journal:
+        journal.set_status(job_id, "done" if complete else "incomplete")
+    return complete
+
+
+# ====== ROLLOUT ======
+async def rollout_structure(
+    guilds: List[discord.Guild],
+    data: Dict[str, Any],
+    journal: Optional[ImportJournal] = None,
+    rate: float = ROLLOUT_RATE,
+    max_guilds: int = ROLLOUT_MAX_GUILDS,
+) -> List[Tuple[discord.Guild, Optional[str], bool, List[str]]]:
+    """Apply one compiled structure to many guilds concurrently.
+
+    All guilds share a single RateBudget, so total wall time follows the
+    request rate rather than guild count. At most ``max_guilds`` run at once
+    and each guild issues one request at a time. Returns one
+    (guild, job_id, complete, problems) tuple per guild, in input order;
+    every guild gets its own journal job so it can be resumed on its own.
+    """
+    budget = RateBudget(rate, burst=max_guilds)
+    limit = asyncio.Semaphore(max_guilds)
+
+    async def run(guild: discord.Guild):
+        problems = missing_overwrite_targets(guild, data)
+        if problems:
+            return guild, None, False, problems
+        job_id = journal.create_job(guild.id, data) if journal else None
+
+        async def collect(line: str):
+            if line.startswith("❌"):
+                problems.append(line)
+
+        async with limit:
+            try:
+                complete = await apply_structure(guild, data, collect, journal, job_id, budget)
+            except Exception as e:
+                complete = False
+                problems.append(f"❌ {e}")
+        return guild, job_id, complete, problems
+
+    return list(await asyncio.gather(*(run(guild) for guild in guilds)))
@@ -0,0 +1,56 @@
+# swatch.py
+# Renders color swatch PNGs in-process for /color, so previews don't depend
+# on a third-party image host. Only needs zlib: a swatch or a palette strip
+# is one repeated scanline, which compresses to a few hundred bytes.
+import struct
+import zlib
+from functools import lru_cache
+from typing import Tuple
+
+SWATCH_SIZE = (400, 100)          # Width, height in pixels
+SWATCH_CACHE_SIZE = 512           # Encoded swatches kept in memory
+PALETTE_HEIGHT = 100              # Palette strip height in pixels
+PALETTE_MAX_WIDTH = 800           # Palette strips are at most this wide...
+PALETTE_BAND_WIDTH = 100          # ...and give each color this much until they hit it
+
+RGB = Tuple[int, int, int]
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def encode_png(width: int, height: int, scanlines: bytes) -> bytes:
+    """PNG file from raw 8-bit RGB scanlines, each already prefixed with its filter byte."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (
+        _PNG_SIGNATURE
+        + _chunk(b"IHDR", header)
+        + _chunk(b"IDAT", zlib.compress(scanlines, 9))
+        + _chunk(b"IEND", b"")
+    )
+
+
+def hex_to_rgb(value: int) -> RGB:
+    return (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+
+
+@lru_cache(maxsize=SWATCH_CACHE_SIZE)
+def render_swatch(color: int, width: int = SWATCH_SIZE[0], height: int = SWATCH_SIZE[1]) -> bytes:
+    """Solid swatch of a 0xRRGGBB color as PNG bytes. Cached by (color, width, height)."""
+    row = b"\x00" + bytes(hex_to_rgb(color)) * width
+    return encode_png(width, height, row * height)
+
+
+@lru_cache(maxsize=SWATCH_CACHE_SIZE)
+def render_palette(colors: Tuple[int, ...], height: int = PALETTE_HEIGHT) -> bytes:
+    """One horizontal strip with an equal band per color, as PNG bytes. Cached by (colors, height)."""
+    width = min(PALETTE_MAX_WIDTH, PALETTE_BAND_WIDTH * len(colors))
+    row = bytearray(b"\x00")
+    for i, color in enumerate(colors):
+        # Spread the remainder so the bands exactly fill the width
+        band = (i + 1) * width // len(colors) - i * width // len(colors)
+        row += bytes(hex_to_rgb(color)) * band
+    return encode_png(width, height, bytes(row) * height)
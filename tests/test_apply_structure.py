@@ -0,0 +1,169 @@
+import asyncio
+
+import discord
+import pytest
+
+import structure
+from fake_discord import FakeGuild, FakeHTTP
+from structure import ImportJournal, apply_structure, compile_structure
+
+TEMPLATE = {
+    "roles": [
+        {"name": "Admin", "permissions": ["administrator"]},
+        {"name": "Mod", "permissions": ["kick_members"]},
+        {"name": "Member"},
+    ],
+    "categories": [
+        {
+            "name": "Info",
+            "overwrites": {"@everyone": {"deny": ["send_messages"]}},
+            "channels": [
+                {"name": "rules"},
+                {"name": "announcements", "overwrites": {"Mod": {"allow": ["send_messages"]}}},
+            ],
+        },
+        {"name": "Hangout", "channels": [{"name": "chat"}, {"name": "Lounge", "type": "voice"}]},
+    ],
+}
+
+
+@pytest.fixture(autouse=True)
+def no_item_delay(monkeypatch):
+    monkeypatch.setattr(structure, "ITEM_DELAY_SECONDS", 0)
+
+
+@pytest.fixture
+def guild():
+    return FakeGuild(FakeHTTP(time_scale=0.001, seed=0))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return ImportJournal(str(tmp_path / "imports.sqlite3"))
+
+
+def _apply(guild, data, journal=None, job_id=None):
+    lines = []
+
+    async def report(line):
+        lines.append(line)
+
+    complete = asyncio.run(apply_structure(guild, data, report, journal, job_id))
+    return complete, lines
+
+
+def _role(guild, name):
+    return discord.utils.get(guild.roles, name=name)
+
+
+def _channel(guild, name):
+    return discord.utils.get(guild.channels_by_id.values(), name=name)
+
+
+def test_roles_are_stacked_in_template_order_under_the_bot(guild):
+    assert _apply(guild, compile_structure(TEMPLATE))[0]
+    ordered = [r.name for r in sorted(guild.roles, reverse=True)]
+    assert ordered == ["Utilitation", "Admin", "Mod", "Member", "@everyone"]
+
+
+def test_categories_and_channels_follow_the_template(guild):
+    assert _apply(guild, compile_structure(TEMPLATE))[0]
+    categories = sorted(guild.categories, key=lambda c: c.position)
+    assert [c.name for c in categories] == [c["name"] for c in TEMPLATE["categories"]]
+    for category, cat_info in zip(categories, TEMPLATE["categories"]):
+        channels = sorted(category.channels, key=lambda c: c.position)
+        assert [c.name for c in channels] == [c["name"] for c in cat_info["channels"]]
+
+
+def test_overwrites_reach_the_channels(guild):
+    assert _apply(guild, compile_structure(TEMPLATE))[0]
+    everyone, mod = guild.default_role, _role(guild, "Mod")
+    assert _channel(guild, "Info").overwrites[everyone].send_messages is False
+    # Channels with their own overwrites keep the category's as well
+    announcements = _channel(guild, "announcements").overwrites
+    assert announcements[everyone].send_messages is False
+    assert announcements[mod].send_messages is True
+    assert mod not in _channel(guild, "rules").overwrites
+
+
+def test_resume_skips_finished_steps(guild, journal, monkeypatch):
+    data = compile_structure(TEMPLATE)
+    job_id = journal.create_job(guild.id, data)
+    create_voice = guild.create_voice_channel
+
+    async def broken(*args, **kwargs):
+        raise discord.DiscordException("interrupted")
+
+    monkeypatch.setattr(guild, "create_voice_channel", broken)
+    complete, lines = _apply(guild, data, journal, job_id)
+    assert not complete
+    assert any("Lounge" in line and "❌" in line for line in lines)
+    assert journal.get_job(job_id)[2] == "incomplete"
+
+    monkeypatch.setattr(guild, "create_voice_channel", create_voice)
+    roles_before, channels_before = len(guild.roles), len(guild.channels_by_id)
+    complete, lines = _apply(guild, data, journal, job_id)
+    assert complete
+    assert journal.get_job(job_id)[2] == "done"
+    # Only the missing channel was created, nothing was duplicated
+    assert len(guild.roles) == roles_before
+    assert len(guild.channels_by_id) == channels_before + 1
+    assert [line for line in lines if "Created" in line] == ["📨 Created channel: `Lounge`"]
+    assert _channel(guild, "Lounge").category is _channel(guild, "Hangout")
+
+
+def test_channel_waits_for_a_role_that_failed(guild, journal, monkeypatch):
+    data = compile_structure(TEMPLATE)
+    job_id = journal.create_job(guild.id, data)
+    create_role = guild.create_role
+
+    async def no_mod(*, name, **kwargs):
+        if name == "Mod":
+            raise discord.DiscordException("boom")
+        return await create_role(name=name, **kwargs)
+
+    monkeypatch.setattr(guild, "create_role", no_mod)
+    complete, lines = _apply(guild, data, journal, job_id)
+    assert not complete
+    assert any("announcements" in line and "Mod" in line and "❌" in line for line in lines)
+    assert _channel(guild, "announcements") is None
+
+    monkeypatch.setattr(guild, "create_role", create_role)
+    assert _apply(guild, data, journal, job_id)[0]
+    assert _channel(guild, "announcements").overwrites[_role(guild, "Mod")].send_messages is True
+
+
+def test_resumed_role_keeps_its_overwrites_after_a_rename(guild, journal, monkeypatch):
+    data = compile_structure(TEMPLATE)
+    job_id = journal.create_job(guild.id, data)
+    create_text = guild.create_text_channel
+
+    async def broken(*args, **kwargs):
+        raise discord.DiscordException("interrupted")
+
+    monkeypatch.setattr(guild, "create_text_channel", broken)
+    assert not _apply(guild, data, journal, job_id)[0]
+    mod = _role(guild, "Mod")
+    mod.name = "Moderator"
+
+    monkeypatch.setattr(guild, "create_text_channel", create_text)
+    assert _apply(guild, data, journal, job_id)[0]
+    assert _role(guild, "Mod") is None
+    assert _channel(guild, "announcements").overwrites[mod].send_messages is True
+
+
+def test_untouched_categories_and_channels_keep_their_place(guild):
+    async def setup():
+        hangout = await guild.create_category("Hangout")
+        await guild.create_text_channel("off-topic", category=hangout)
+        other = await guild.create_category("Other")
+        await guild.create_text_channel("misc", category=other)
+
+    asyncio.run(setup())
+    assert _apply(guild, compile_structure(TEMPLATE))[0]
+    # Info and Hangout swap into the places template categories hold; Other stays second
+    categories = sorted(guild.categories, key=lambda c: c.position)
+    assert [c.name for c in categories] == ["Info", "Other", "Hangout"]
+    hangout = sorted(_channel(guild, "Hangout").channels, key=lambda c: c.position)
+    assert [c.name for c in hangout] == ["off-topic", "chat", "Lounge"]
+    assert _channel(guild, "misc").position == 0
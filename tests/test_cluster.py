@@ -0,0 +1,27 @@
+import pytest
+
+import cluster
+from cluster import owns_guild, shard_for_guild, split_shards
+
+
+@pytest.mark.parametrize("shards, processes", [(1, 1), (16, 4), (10, 3), (3, 8)])
+def test_split_shards_covers_every_shard_once(shards, processes):
+    ranges = split_shards(shards, processes)
+    assert sum(ranges, []) == list(range(shards))
+    sizes = [len(r) for r in ranges]
+    assert len(ranges) == min(shards, processes)
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_shard_for_guild():
+    assert shard_for_guild(5 << 22, 4) == 1
+    assert shard_for_guild((5 << 22) + 12345, 4) == 1
+
+
+def test_owns_guild(monkeypatch):
+    guild_id = 6 << 22
+    assert owns_guild(guild_id)  # Not clustered: every guild is ours
+    monkeypatch.setattr(cluster, "SHARD_COUNT", 4)
+    monkeypatch.setattr(cluster, "SHARD_IDS", [2, 3])
+    assert owns_guild(guild_id)
+    assert not owns_guild(5 << 22)
@@ -0,0 +1,43 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import puppet_relay
+from puppet_relay import PuppetRelay, StreamedFile
+
+RATE = 10.0
+BURST = 2
+
+
+def test_pacing_holds_when_the_queue_empties_between_messages(monkeypatch):
+    monkeypatch.setattr(puppet_relay, "CHANNEL_SEND_RATE", RATE)
+    monkeypatch.setattr(puppet_relay, "CHANNEL_SEND_BURST", BURST)
+    relay = PuppetRelay(SimpleNamespace(), mode="send")
+    channel = SimpleNamespace(id=1)
+    sent = []
+
+    async def send(_channel, content, files=None):
+        sent.append(time.monotonic())
+        await asyncio.sleep(0.01)
+
+    relay._send = send
+
+    async def run():
+        futures = []
+        # Each send finishes before the next message arrives, so the queue is dropped every time
+        for i in range(12):
+            futures.append(relay._enqueue(channel, f"message {i}"))
+            await asyncio.sleep(0.03)
+        await asyncio.gather(*futures)
+
+    asyncio.run(run())
+    # A bucket never allows more than BURST + RATE * elapsed sends
+    for i, at in enumerate(sent):
+        assert at - sent[0] >= (i + 1 - BURST) / RATE - 0.01
+    assert len(sent) < 12  # The backlog built up by the pacing was coalesced
+
+
+def test_spoiler_attachment_keeps_a_single_prefix():
+    file = StreamedFile(SimpleNamespace(), "SPOILER_cat.png", lambda: None, spoiler=True)
+    assert file.filename == "SPOILER_cat.png"
+    assert StreamedFile(SimpleNamespace(), "cat.png", lambda: None).filename == "cat.png"
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from structure import RateBudget
+
+
+async def _take(budget, count):
+    start = time.monotonic()
+    for _ in range(count):
+        await budget.acquire()
+    return time.monotonic() - start
+
+
+def test_burst_is_free_then_paced():
+    budget = RateBudget(rate=50, burst=5)
+    assert asyncio.run(_take(budget, 5)) < 0.05
+    # The next 5 need a refill at 50/s, about 0.1 s
+    assert asyncio.run(_take(budget, 5)) >= 0.08
+
+
+def test_concurrent_takers_share_the_budget():
+    async def run():
+        budget = RateBudget(rate=100, burst=1)
+        start = time.monotonic()
+        await asyncio.gather(*(budget.acquire() for _ in range(11)))
+        return time.monotonic() - start
+
+    # One from the burst, then ten more at 100/s
+    assert asyncio.run(run()) >= 0.09
@@ -0,0 +1,74 @@
+import sqlite3
+import threading
+import time
+
+from cogs import stocks
+from cogs.stocks import DAY_SECONDS, StockDB, decode_day, encode_day
+
+DAY = 20000 * DAY_SECONDS
+
+
+def test_day_round_trip():
+    samples = [(DAY + i * 600, round(100 + i * 0.37, 2)) for i in range(144)]
+    ts, prices = decode_day(DAY, encode_day(DAY, samples))
+    assert list(ts) == [t for t, _ in samples]
+    assert list(prices) == [p for _, p in samples]
+
+
+def test_empty_day_round_trip():
+    ts, prices = decode_day(DAY, encode_day(DAY, []))
+    assert len(ts) == 0 and len(prices) == 0
+
+
+def test_prices_are_stored_to_the_cent():
+    _ts, prices = decode_day(DAY, encode_day(DAY, [(DAY, 12.344), (DAY + 1, 12.346)]))
+    assert list(prices) == [12.34, 12.35]
+
+
+def test_archive_moves_whole_days_and_merges(tmp_path):
+    db = StockDB(str(tmp_path / "stocks.sqlite3"))
+    con = sqlite3.connect(db.path)
+    con.execute("INSERT INTO companies (name, price) VALUES ('Acme', 10)")
+    rows = [(1, DAY + i * 3600, 10 + i) for i in range(72)]  # three days, hourly
+    con.executemany("INSERT INTO price_history (company_id, ts, price) VALUES (?, ?, ?)", rows[:30])
+    con.commit()
+
+    # Only the first full day is before the cutoff
+    assert db.archive_history(DAY + DAY_SECONDS + 5) == 24
+    # A late sample for an archived day is merged into its blob
+    con.executemany("INSERT INTO price_history (company_id, ts, price) VALUES (?, ?, ?)", rows[30:])
+    con.execute("INSERT INTO price_history (company_id, ts, price) VALUES (1, ?, 99)", (DAY + 1,))
+    con.commit()
+    assert db.archive_history(DAY + 2 * DAY_SECONDS) == 25
+
+    ts, prices = db.read_history(1, DAY, DAY + 3 * DAY_SECONDS)
+    expected = sorted(rows + [(1, DAY + 1, 99)])
+    assert list(ts) == [t for _, t, _ in expected]
+    assert list(prices) == [p for _, _, p in expected]
+    assert con.execute("SELECT COUNT(*) FROM price_history").fetchone()[0] == 24
+    con.close()
+
+
+def test_read_history_sees_a_day_archived_mid_read(tmp_path, monkeypatch):
+    db = StockDB(str(tmp_path / "stocks.sqlite3"))
+    con = sqlite3.connect(db.path)
+    con.execute("INSERT INTO companies (name, price) VALUES ('Acme', 10)")
+    rows = [(1, DAY + i * 3600, 10 + i) for i in range(48)]  # two days, hourly
+    con.executemany("INSERT INTO price_history (company_id, ts, price) VALUES (?, ?, ?)", rows)
+    con.commit()
+    con.close()
+    db.archive_history(DAY + DAY_SECONDS)  # Day one is archived, day two is live
+
+    # Archive day two from another thread while read_history is between its two reads
+    archiver = threading.Thread(target=db.archive_history, args=(DAY + 2 * DAY_SECONDS,))
+
+    def decode_and_archive(day, blob):
+        if not archiver.is_alive():
+            archiver.start()
+            time.sleep(0.2)
+        return decode_day(day, blob)
+
+    monkeypatch.setattr(stocks, "decode_day", decode_and_archive)
+    ts, _prices = db.read_history(1, DAY, DAY + 2 * DAY_SECONDS)
+    archiver.join()
+    assert list(ts) == [t for _, t, _ in rows]
@@ -0,0 +1,75 @@
+import pytest
+
+from structure import StructureError, compile_structure
+
+
+def _errors(data):
+    with pytest.raises(StructureError) as info:
+        compile_structure(data)
+    return info.value.errors
+
+
+def test_compiles_valid_structure():
+    data = compile_structure({
+        "roles": [{"name": "Mod", "color": "#FF5733", "permissions": ["kick_members"]}],
+        "categories": [{
+            "name": "General",
+            "channels": [
+                {"name": "chat", "topic": "Hi", "overwrites": {"Mod": {"allow": ["manage_messages"]}}},
+                {"name": "Voice", "type": "voice"},
+            ],
+        }],
+    })
+    assert data["roles"][0]["color"] == 0xFF5733
+    assert data["roles"][0]["permissions"] != 0
+    channels = data["categories"][0]["channels"]
+    assert [c["type"] for c in channels] == ["text", "voice"]
+    assert channels[0]["overwrites"][0]["target"] == "Mod"
+    assert not channels[0]["overwrites"][0]["external"]
+
+
+def test_top_level_must_be_object():
+    assert _errors([]) == ["$: top level must be an object with 'roles' and 'categories'"]
+
+
+def test_duplicate_role():
+    errors = _errors({"roles": [{"name": "Mod"}, {"name": "Mod"}], "categories": []})
+    assert errors == ["$.roles[1].name: duplicate role 'Mod'"]
+
+
+def test_duplicate_category():
+    errors = _errors({"categories": [{"name": "Info", "channels": []}, {"name": "Info", "channels": []}]})
+    assert errors == ["$.categories[1].name: duplicate category 'Info'"]
+
+
+def test_duplicate_channel_in_category():
+    errors = _errors({"categories": [{"name": "Info", "channels": [{"name": "rules"}, {"name": "rules"}]}]})
+    assert errors == ["$.categories[0].channels[1].name: duplicate channel 'rules' in this category"]
+
+
+def test_same_channel_name_in_two_categories_is_fine():
+    compile_structure({"categories": [
+        {"name": "A", "channels": [{"name": "chat"}]},
+        {"name": "B", "channels": [{"name": "chat"}]},
+    ]})
+
+
+def test_bad_values_are_all_reported():
+    errors = _errors({
+        "roles": [{"name": "Mod", "color": "orange", "permissions": ["fly"]}],
+        "categories": [{"name": "A", "channels": [
+            {"name": "x", "type": "forum"},
+            {"name": "y", "type": "voice", "topic": "no"},
+        ]}],
+    })
+    assert any(e.startswith("$.roles[0].color: invalid color") for e in errors)
+    assert "$.roles[0].permissions[0]: unknown permission 'fly'" in errors
+    assert any(e.startswith("$.categories[0].channels[0].type: unknown channel type 'forum'") for e in errors)
+    assert "$.categories[0].channels[1].topic: only text channels have topics" in errors
+
+
+def test_allow_and_deny_overlap():
+    errors = _errors({"categories": [{"name": "A", "channels": [], "overwrites": {
+        "@everyone": {"allow": ["send_messages"], "deny": ["send_messages"]},
+    }}]})
+    assert errors == ['$.categories[0].overwrites["@everyone"]: the same permission is both allowed and denied']